@@ -0,0 +1,154 @@
+# Preprocessed asset cache and sprite atlas.
+#
+# Sprites are scaled once and packed into a single atlas image, stored in
+# cache_dir next to a JSON manifest. The manifest is keyed on each source
+# file's mtime and the requested sizes, so a warm start loads one PNG,
+# converts it to the display format with convert_alpha() and hands out
+# subsurfaces, while any edit to a source image or to the cell size
+# triggers a rebuild. The background is cached pre-scaled the same way.
+#
+# Cache files are written beside their target and renamed over it, and a
+# cache entry that fails to read is rebuilt from the sources, so a crash
+# mid-write never leaves a start-up that fails until the cache is deleted.
+#
+# The decode_* functions only touch files and plain surfaces, so they can
+# run on a loader thread; converting to the display format is left to the
+# main thread (finish_sprites, or the load_* wrappers).
+import hashlib
+import json
+import os
+
+import pygame
+
+CACHE_VERSION = 1
+ATLAS_PADDING = 1
+ATLAS_MAX_WIDTH = 512
+
+
+def cache_key(sources, sizes):
+    parts = [CACHE_VERSION]
+    for name in sorted(sources):
+        parts.append([name, sources[name], os.stat(sources[name]).st_mtime_ns, list(sizes[name])])
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+
+def pack(sizes):
+    # Shelf packing, tallest first. Returns ({name: (x, y, w, h)}, atlas size)
+    placements = {}
+    x = y = shelf_height = width = 0
+    for name in sorted(sizes, key=lambda name: (-sizes[name][1], name)):
+        w, h = sizes[name]
+        if x and x + w > ATLAS_MAX_WIDTH:
+            x = 0
+            y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        placements[name] = (x, y, w, h)
+        x += w + ATLAS_PADDING
+        width = max(width, x)
+        shelf_height = max(shelf_height, h)
+    return placements, (max(width, 1), max(y + shelf_height, 1))
+
+
+def save_image(surface, path):
+    # The temporary name keeps the extension pygame picks the format from
+    root, ext = os.path.splitext(path)
+    temp_path = f"{root}.tmp{ext}"
+    pygame.image.save(surface, temp_path)
+    os.replace(temp_path, path)
+
+
+def save_manifest(manifest, path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def read_manifest(path):
+    # None when missing or unreadable, so the caller rebuilds
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def load_cached_image(path):
+    try:
+        return pygame.image.load(path)
+    except (pygame.error, OSError):
+        return None
+
+
+def build_atlas(sources, sizes, atlas_path, manifest_path, key):
+    placements, atlas_size = pack(sizes)
+    atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    for name, (x, y, w, h) in placements.items():
+        image = pygame.transform.scale(pygame.image.load(sources[name]), (w, h))
+        # RGBA_MAX onto a cleared atlas copies pixels without blending
+        atlas.blit(image, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+    # The manifest goes last, so it never names an atlas that is not there
+    save_image(atlas, atlas_path)
+    save_manifest({"key": key, "sprites": placements}, manifest_path)
+    return atlas, placements
+
+
+def decode_sprites(sources, sizes, cache_dir, atlas_name="atlas"):
+    # sources: {name: png path}, sizes: {name: (w, h)}. Returns the atlas
+    # surface and {name: (x, y, w, h)}
+    os.makedirs(cache_dir, exist_ok=True)
+    atlas_path = os.path.join(cache_dir, f"{atlas_name}.png")
+    manifest_path = os.path.join(cache_dir, f"{atlas_name}.json")
+    key = cache_key(sources, sizes)
+
+    manifest = read_manifest(manifest_path)
+    if manifest is not None and manifest.get("key") == key:
+        atlas = load_cached_image(atlas_path)
+        if atlas is not None:
+            return atlas, manifest["sprites"]
+    return build_atlas(sources, sizes, atlas_path, manifest_path, key)
+
+
+def finish_sprites(decoded):
+    atlas, placements = decoded
+    atlas = atlas.convert_alpha()
+    return {name: atlas.subsurface(pygame.Rect(rect)) for name, rect in placements.items()}
+
+
+def load_sprites(sources, sizes, cache_dir, atlas_name="atlas"):
+    return finish_sprites(decode_sprites(sources, sizes, cache_dir, atlas_name))
+
+
+def decode_background(source, size, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key({"background": source}, {"background": size})
+    cached_path = os.path.join(cache_dir, f"background-{key[:12]}.png")
+    background = load_cached_image(cached_path) if os.path.exists(cached_path) else None
+    if background is None:
+        background = pygame.transform.scale(pygame.image.load(source), size)
+        save_image(background, cached_path)
+    return background
+
+
+def load_background(source, size, cache_dir):
+    return decode_background(source, size, cache_dir).convert()
+
+
+def placeholder(size, color=(128, 128, 128, 255), alpha=True):
+    # Stands in for an image until its real pixels are copied in
+    surface = pygame.Surface(size, pygame.SRCALPHA if alpha else 0)
+    surface = surface.convert_alpha() if alpha else surface.convert()
+    surface.fill(color)
+    return surface
+
+
+def copy_into(target, image):
+    # Replaces target's pixels in place, so every sprite and cache already
+    # holding target picks up the real image
+    if target.get_flags() & pygame.SRCALPHA:
+        target.fill((0, 0, 0, 0))
+        target.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+    else:
+        target.blit(image, (0, 0))
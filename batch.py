@@ -0,0 +1,234 @@
+# Parallel batch simulation for balance and load sweeps. Every combination
+# of seed, bot policy, shop plan and tunable value is one headless game,
+# run to the tick limit or the player's death on a pool of worker
+# processes; per-run rows go to CSV (or Parquet) and a grouped summary is
+# printed.
+#
+#   python batch.py --seeds 1-200 --policies kite --set turret_scaling=1.3,1.5,1.7 --out runs.csv
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+import headless
+from headless import game
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Command line name -> (game.py constant, type)
+TUNABLES = {
+    "enemy_health": ("ENEMY_BASE_HEALTH", int),
+    "enemy_health_per_level": ("ENEMY_HEALTH_PER_LEVEL", int),
+    "turret_delay": ("TURRET_BASE_SHOOT_DELAY", float),
+    "turret_scaling": ("TURRET_DELAY_SCALING", float),
+    "lightning_level": ("LIGHTNING_START_LEVEL", int),
+}
+# Command line name -> index into game.SHOP_ITEMS
+PRICES = {"price_shield": 0, "price_health": 1, "price_shotgun": 2, "price_turret": 3, "price_lightning": 4}
+DEFAULTS = {name: getattr(game, constant) for name, (constant, _) in TUNABLES.items()}
+DEFAULTS.update({name: game.SHOP_ITEMS[index][1] for name, index in PRICES.items()})
+
+# Shop items the bot buys, in order, cycling whenever it can afford the next
+BUY_PLANS = {
+    "none": (),
+    "turret": (3,),
+    "lightning": (4,),
+    "shotgun": (2,),
+    "balanced": (2, 3, 4, 0, 1),
+}
+
+def parse_seeds(text):
+    seeds = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        seeds.extend(range(int(first), int(last or first) + 1))
+    return seeds
+
+def parse_sweep(assignments):
+    # ["turret_scaling=1.3,1.5", "price_turret=300,500"] -> list of dicts,
+    # one per point of the grid
+    axes = []
+    for assignment in assignments:
+        name, _, values = assignment.partition("=")
+        if name in TUNABLES:
+            cast = TUNABLES[name][1]
+        elif name in PRICES:
+            cast = int
+        else:
+            raise SystemExit(f"unknown tunable {name!r}; choose from {', '.join([*TUNABLES, *PRICES])}")
+        axes.append([(name, cast(value)) for value in values.split(",")])
+    return [dict(point) for point in itertools.product(*axes)]
+
+def apply_params(params):
+    # Workers run many jobs, so every tunable is set, not just the swept ones
+    values = {**DEFAULTS, **params}
+    for name, (constant, _) in TUNABLES.items():
+        setattr(game, constant, values[name])
+    for name, index in PRICES.items():
+        if game.shop.layout[index]["price"] != values[name]:
+            game.shop.set_price(index, values[name])
+
+def init_worker():
+    # buy_item() reports every purchase on stdout
+    sys.stdout = open(os.devnull, "w")
+
+def run_job(job):
+    seed, policy_name, plan_name, params, ticks, fire_every, use_vectorized = job
+    apply_params(params)
+    headless.new_game(seed, use_vectorized)
+    policy = headless.POLICIES[policy_name]
+    plan = BUY_PLANS[plan_name]
+    layout = game.shop.layout
+    purchases = 0
+    totals = dict.fromkeys(game.entity_counts(), 0)
+    peak_enemies = 0
+    tick_times = []
+    survival = ticks
+    for tick in range(ticks):
+        keys, mouse_pos, shots = policy(tick, fire_every)
+        bought = ()
+        if plan:
+            item_index = plan[purchases % len(plan)]
+            if game.world.score >= layout[item_index]["price"]:
+                bought = (item_index,)
+                purchases += 1
+        tick_start = time.perf_counter()
+        game.run_tick(keys, mouse_pos, shots, purchases=bought)
+        tick_times.append(time.perf_counter() - tick_start)
+        counts = game.entity_counts()
+        for name, count in counts.items():
+            totals[name] += count
+        peak_enemies = max(peak_enemies, counts["enemies"])
+        if game.player.health <= 0:
+            survival = tick + 1
+            break
+
+    ticks_run = len(tick_times)
+    tick_times.sort()
+    row = {"seed": seed, "policy": policy_name, "buy": plan_name, **{**DEFAULTS, **params}}
+    row.update({
+        "survival_ticks": survival,
+        "died": game.player.health <= 0,
+        "score": game.world.score,
+        "level": game.world.level,
+        "purchases": purchases,
+        "peak_enemies": peak_enemies,
+        **{f"mean_{name}": total / ticks_run for name, total in totals.items()},
+        "mean_tick_ms": 1000 * sum(tick_times) / ticks_run,
+        "p99_tick_ms": 1000 * headless.percentile(tick_times, 0.99),
+    })
+    return row
+
+def run_batch(jobs, workers):
+    if workers == 1:
+        init_worker()
+        try:
+            return [run_job(job) for job in jobs]
+        finally:
+            sys.stdout.close()
+            sys.stdout = sys.__stdout__
+    # Jobs are independent and return a small row each, so throughput scales
+    # with the number of worker processes. SDL turns SIGTERM into a quit
+    # event, so workers are shut down with close() rather than terminate().
+    with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+        rows = list(pool.imap_unordered(run_job, jobs))
+        pool.close()
+        pool.join()
+    return rows
+
+def write_rows(rows, path):
+    if path.endswith(".parquet"):
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def summarize(rows, swept):
+    groups = {}
+    for row in rows:
+        key = (row["policy"], row["buy"], *(row[name] for name in swept))
+        groups.setdefault(key, []).append(row)
+    summary = []
+    for key, group in sorted(groups.items()):
+        n = len(group)
+        summary.append({
+            "policy": key[0],
+            "buy": key[1],
+            **dict(zip(swept, key[2:])),
+            "runs": n,
+            "survival_ticks": sum(row["survival_ticks"] for row in group) / n,
+            "died_pct": 100 * sum(row["died"] for row in group) / n,
+            "score": sum(row["score"] for row in group) / n,
+            "level": sum(row["level"] for row in group) / n,
+            "mean_enemies": sum(row["mean_enemies"] for row in group) / n,
+            "mean_tick_ms": sum(row["mean_tick_ms"] for row in group) / n,
+        })
+    return summary
+
+def format_summary(summary):
+    columns = list(summary[0])
+    widths = [max(len(column), 10) for column in columns]
+    lines = ["  ".join(f"{column:>{width}}" for column, width in zip(columns, widths))]
+    for row in summary:
+        cells = (f"{value:.2f}" if isinstance(value, float) else str(value) for value in row.values())
+        lines.append("  ".join(f"{cell:>{width}}" for cell, width in zip(cells, widths)))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel headless simulation sweeps")
+    parser.add_argument("--seeds", default="1-20", help="seed list and ranges, e.g. 1-100,200")
+    parser.add_argument("--policies", default="kite", help=f"comma separated bot policies: {', '.join(headless.POLICIES)}")
+    parser.add_argument("--buy", default="none", help=f"comma separated shop plans: {', '.join(BUY_PLANS)}")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help=f"sweep a tunable over values: {', '.join([*TUNABLES, *PRICES])}")
+    parser.add_argument("--ticks", type=int, default=3600, help="tick limit per run")
+    parser.add_argument("--fire-every", type=int, default=20, help="ticks between bot shots")
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy entity store")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--out", metavar="FILE", help="write one row per run to FILE (.csv or .parquet)")
+    parser.add_argument("--summary", metavar="FILE", help="write the grouped summary to FILE as CSV")
+    args = parser.parse_args(argv)
+
+    policies = args.policies.split(",")
+    plans = args.buy.split(",")
+    for name in policies:
+        if name not in headless.POLICIES:
+            parser.error(f"unknown policy {name!r}")
+    for name in plans:
+        if name not in BUY_PLANS:
+            parser.error(f"unknown shop plan {name!r}")
+    for path in (args.out, args.summary):
+        if path and path.endswith(".parquet") and pyarrow is None:
+            parser.error("writing Parquet needs pyarrow; use a .csv path instead")
+    sweep = parse_sweep(args.set)
+    swept = list(sweep[0])
+    jobs = [(seed, policy, plan, params, args.ticks, args.fire_every, args.vectorized)
+            for params in sweep for policy in policies for plan in plans for seed in parse_seeds(args.seeds)]
+
+    workers = max(1, min(args.workers, len(jobs)))
+    start = time.perf_counter()
+    rows = run_batch(jobs, workers)
+    elapsed = time.perf_counter() - start
+    rows.sort(key=lambda row: (row["policy"], row["buy"], *(row[name] for name in swept), row["seed"]))
+
+    ticks = sum(row["survival_ticks"] for row in rows)
+    print(f"{len(rows)} runs, {ticks} ticks in {elapsed:.1f} s "
+          f"({ticks / elapsed:.0f} ticks/sec on {workers} workers)")
+    summary = summarize(rows, swept)
+    print(format_summary(summary))
+    if args.out:
+        write_rows(rows, args.out)
+    if args.summary:
+        write_rows(summary, args.summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Deterministic headless benchmark: python bench.py [--ticks N] [--scenarios 10,1000]
+import argparse
+import json
+
+import headless
+
+DEFAULT_SCENARIOS = (10, 1000, 10000)
+
+def format_result(result):
+    peak = result["peak"]
+    dirty = "-" if result["dirty_pct"] is None else f"{result['dirty_pct']:.1f}"
+    return (f"{result['scenario']:>14}  {result['ticks_per_sec']:10.1f}  "
+            f"{result['p50_ms']:9.3f}  {result['p99_ms']:9.3f}  "
+            f"{peak['enemies']:>7}  {peak['bullets']:>7}  {peak['lightning_chains']:>7}  {dirty:>7}")
+
+def format_phases(phases):
+    ordered = sorted(phases.items(), key=lambda item: -item[1])
+    return "".join(f"{'':>16}{name:<12}{ms:8.3f} ms\n" for name, ms in ordered)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless simulation benchmark")
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", default=",".join(str(n) for n in DEFAULT_SCENARIOS),
+                        help="comma separated enemy counts")
+    parser.add_argument("--turrets", type=int, default=0)
+    parser.add_argument("--shotgun", type=int, default=0, help="starting shotgun level")
+    parser.add_argument("--fire-every", type=int, default=20, help="ticks between shots, 0 to hold fire")
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy entity store")
+    parser.add_argument("--render", action="store_true",
+                        help="also run the draw path on the dummy display and report dirty area")
+    parser.add_argument("--profile", action="store_true", help="report mean ms per simulation phase")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace of every run to FILE")
+    parser.add_argument("--check", action="store_true",
+                        help="verify the vectorized path matches the per-sprite path instead of timing")
+    parser.add_argument("--startup", action="store_true", help="report cold and warm asset startup time")
+    parser.add_argument("--record", metavar="FILE", help="record the scripted bot's input to FILE and exit")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="re-simulate a recorded input log, check its final state and exit")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        ticks = headless.record(args.record, args.ticks, args.seed, fire_every=args.fire_every)
+        print(f"Recorded {ticks} ticks to {args.record}")
+        return
+    if args.replay:
+        result = headless.replay(args.replay, args.vectorized)
+        status = "matches" if result["matches"] else "DIVERGED from"
+        print(json.dumps(result) if args.json else
+              f"{result['ticks']} ticks at {result['ticks_per_sec']:.1f} ticks/sec, {status} the recording")
+        return
+
+    if args.startup:
+        times = headless.startup_times()
+        print(json.dumps({"startup_ms": times}) if args.json else
+              f"asset startup: cold {times['cold']:.1f} ms, warm {times['warm']:.1f} ms, "
+              f"first frame {times['first_frame']:.1f} ms", flush=True)
+
+    if not args.json and not args.check:
+        print(f"{'scenario':>14}  {'ticks/sec':>10}  {'p50 ms':>9}  {'p99 ms':>9}  "
+              f"{'enemies':>7}  {'bullets':>7}  {'chains':>7}  {'dirty %':>7}")
+    profiler = headless.game.profiler
+    if args.trace:
+        profiler.start_trace()
+    for count in args.scenarios.split(","):
+        count = int(count)
+        scenario = headless.Scenario(f"{count} enemies", count, ticks=args.ticks,
+                                     seed=args.seed, turrets=args.turrets,
+                                     fire_every=args.fire_every, shotgun_level=args.shotgun,
+                                     vectorized=args.vectorized, render=args.render)
+        if args.check:
+            mismatch = headless.compare_backends(scenario)
+            status = "match" if mismatch is None else f"diverged at tick {mismatch}"
+            print(f"{scenario.name:>14}  {status}", flush=True)
+            continue
+        result = headless.run(scenario, profile=args.profile)
+        print(json.dumps(result) if args.json else format_result(result), flush=True)
+        if args.profile and not args.json:
+            print(format_phases(result["phases_ms"]), flush=True)
+    if args.trace:
+        print(f"Wrote {profiler.export_trace(args.trace)} trace events to {args.trace}")
+
+if __name__ == "__main__":
+    main()
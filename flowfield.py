@@ -0,0 +1,106 @@
+# Grid flow field for enemy pathing.
+#
+# One Dijkstra pass over the cell grid, outward from the target's cell,
+# gives every cell the unit vector toward its cheapest neighbour. The field
+# is only recomputed when the target changes cells or obstacles change, and
+# any number of enemies then read their heading with a single lookup.
+import heapq
+import math
+
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+class FlowField:
+    def __init__(self, grid_width, grid_height, cell_width, cell_height):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.blocked = set()
+        self.target_cell = None
+        self.dirty = True
+        # Bumped on every recompute so cached copies know when to refresh
+        self.version = 0
+        self.distances = [math.inf] * (grid_width * grid_height)
+        # Unit (dx, dy) per cell; None in the target cell and unreachable cells
+        self.directions = [None] * (grid_width * grid_height)
+        # Per cell index, its in-grid neighbours as (index, cell, the two cells
+        # a diagonal step passes, pixel distance between centers, unit heading);
+        # straight steps repeat the neighbour as both corners
+        self.cells = [(cx, cy) for cy in range(grid_height) for cx in range(grid_width)]
+        self.neighbours = []
+        for cx, cy in self.cells:
+            cell_neighbours = []
+            for dx, dy in NEIGHBOURS:
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < grid_width and 0 <= ny < grid_height:
+                    cost = math.hypot(dx * cell_width, dy * cell_height)
+                    corners = ((nx, cy), (cx, ny)) if dx and dy else ((nx, ny), (nx, ny))
+                    cell_neighbours.append((ny * grid_width + nx, (nx, ny), corners, cost,
+                                            (dx * cell_width / cost, dy * cell_height / cost)))
+            self.neighbours.append(cell_neighbours)
+
+    def cell_of(self, x, y):
+        cx = min(max(int(x // self.cell_width), 0), self.grid_width - 1)
+        cy = min(max(int(y // self.cell_height), 0), self.grid_height - 1)
+        return cx, cy
+
+    def set_blocked(self, cell, blocked=True):
+        if blocked:
+            self.blocked.add(cell)
+        else:
+            self.blocked.discard(cell)
+        self.dirty = True
+
+    def update(self, target_pos):
+        target_cell = self.cell_of(*target_pos)
+        if target_cell != self.target_cell or self.dirty:
+            self.target_cell = target_cell
+            self.dirty = False
+            self.compute()
+
+    def compute(self):
+        width = self.grid_width
+        blocked = self.blocked
+        neighbours = self.neighbours
+        distances = [math.inf] * (width * self.grid_height)
+        tx, ty = self.target_cell
+        target = ty * width + tx
+        distances[target] = 0.0
+        queue = [(0.0, target)]
+        pop, push = heapq.heappop, heapq.heappush
+        while queue:
+            distance, index = pop(queue)
+            if distance > distances[index]:
+                continue
+            for neighbour, cell, corners, cost, _ in neighbours[index]:
+                # Diagonal steps may not cut the corner of a blocked cell
+                if blocked and (cell in blocked or corners[0] in blocked or corners[1] in blocked):
+                    continue
+                candidate = distance + cost
+                if candidate < distances[neighbour]:
+                    distances[neighbour] = candidate
+                    push(queue, (candidate, neighbour))
+
+        directions = [None] * len(distances)
+        for index, cell_neighbours in enumerate(neighbours):
+            best = distances[index]
+            if best == 0.0 or best == math.inf or (blocked and self.cells[index] in blocked):
+                continue
+            for neighbour, cell, corners, _, direction in cell_neighbours:
+                if blocked and (cell in blocked or corners[0] in blocked or corners[1] in blocked):
+                    continue
+                if distances[neighbour] < best:
+                    best = distances[neighbour]
+                    directions[index] = direction
+        self.distances = distances
+        self.directions = directions
+        self.version += 1
+
+    def direction_at(self, x, y):
+        # Takes an integer pixel position, e.g. a rect center; off-grid
+        # positions get None and steer directly like the target cell
+        cx, cy = x // self.cell_width, y // self.cell_height
+        if 0 <= cx < self.grid_width and 0 <= cy < self.grid_height:
+            return self.directions[cy * self.grid_width + cx]
+        return None
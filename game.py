@@ -3,6 +3,29 @@ import sys
 import random
 import math
 import os
+import time
+from functools import partial
+
+import assets
+import vectorized
+from flowfield import FlowField
+from hud import Hud, TextCache
+from loader import AssetLoader
+from pool import Pool
+from profiler import Profiler, ProfilerOverlay
+from rotation import RotationCache
+from overlay import BarStrips, Overlay
+from render import DirtyRenderer
+from replay import InputLog, Recorder
+import savestate
+from scheduler import FrameScheduler
+from spatial import SpatialHash
+from spawner import SpawnScheduler
+
+# Headless mode runs the simulation without a real window (benchmarks, CI)
+headless = os.environ.get("GAME_HEADLESS") == "1"
+if headless:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
 # Initialize Pygame
 pygame.init()
@@ -19,27 +42,156 @@ cell_width, cell_height = screen_width // grid_width, screen_height // grid_heig
 # Initialize font for score and health
 pygame.font.init()
 font = pygame.font.Font(None, 36)
+text_cache = TextCache(font)
 
 # Get the current working directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Optional NumPy structure-of-arrays update path for enemies and bullets
+use_vectorized = os.environ.get("GAME_VECTORIZED") == "1" and vectorized.available
+
+# Rotated sprites are cached in ROTATION_STEP degree buckets, at most
+# ROTATION_CACHE_SIZE surfaces per image (None keeps every bucket)
+ROTATION_STEP = 2
+ROTATION_CACHE_SIZE = None
+
+# Dirty-rectangle rendering (GAME_RENDER=full restores full-screen flips)
+DIRTY_RECTS = os.environ.get("GAME_RENDER", "dirty") == "dirty"
+FULL_REDRAW_THRESHOLD = 0.5
+
+# Free objects kept for reuse, per pool
+BULLET_POOL_SIZE = 1024
+ENEMY_POOL_SIZE = 1024
+LIGHTNING_POOL_SIZE = 256
+
+# Fixed simulation timestep. Speeds are in pixels per tick, so gameplay
+# runs at the same pace whatever the render rate.
+FPS = 60
+TICK_MS = 1000 / FPS
+
+# Render rate cap (GAME_FPS_CAP=0 for uncapped) and the most simulation
+# ticks one frame may run before falling behind is absorbed by dropping time
+FPS_CAP = int(os.environ.get("GAME_FPS_CAP", FPS))
+MAX_TICKS_PER_FRAME = 5
+
+# Balance tunables; batch.py sweeps these
+ENEMY_BASE_HEALTH = 50
+ENEMY_HEALTH_PER_LEVEL = 10
+TURRET_BASE_SHOOT_DELAY = 1000
+TURRET_DELAY_SCALING = 1.5
+LIGHTNING_START_LEVEL = 1  # Assuming starting with level 1 for demonstration
+
+# Waves by level: (enemy cap, enemies spawned per tick, power-up cap). Level 1
+# is the original ten enemies; a level missing from the table plays the row
+# of the highest level below it.
+WAVES = {
+    1: (10, 1.0, 2),
+    2: (15, 0.25, 2),
+    3: (20, 0.25, 2),
+    4: (30, 0.5, 2),
+    6: (50, 0.5, 3),
+    8: (80, 1.0, 3),
+    10: (120, 1.0, 3),
+    13: (200, 2.0, 4),
+    16: (320, 2.0, 4),
+    20: (500, 4.0, 4),
+    25: (800, 4.0, 5),
+    30: (1200, 8.0, 5),
+}
+# Spawning stops while enemies, bullets, power-ups, turrets and lightning
+# chains together reach ENTITY_BUDGET. In live play the wave also shrinks
+# while simulating a tick takes longer than SPAWN_TICK_BUDGET_MS.
+ENTITY_BUDGET = 3000
+SPAWN_TICK_BUDGET_MS = TICK_MS / 2
+# Enemies never spawn within this many grid cells of the player, power-ups
+# only outside the player's own cell
+ENEMY_SAFE_CELLS = 2
+POWER_UP_SAFE_CELLS = 0
+
+# Sprite sizes in the atlas; scaled images are cached in asset_cache_dir
+SPRITE_SIZES = {
+    "player": (cell_width, cell_height),
+    "enemy": (cell_width, cell_height),
+    "bullet": (10, 10),
+    "power_up": (cell_width // 4, cell_height // 4),
+    "turret": (cell_width, cell_height),
+}
+asset_cache_dir = os.path.join(current_dir, ".asset_cache")
+# The first playable frame waits only for the critical atlas; the rest of
+# the sprites, the background and the sounds stream in during play
+CRITICAL_SPRITES = ("player", "enemy", "bullet")
+EXTRA_SPRITES = ("power_up", "turret")
+# Every .wav/.ogg file here is loaded as a sound effect named after the file;
+# music.ogg is streamed as background music instead
+sound_dir = os.path.join(current_dir, "sounds")
+music_file = os.path.join(sound_dir, "music.ogg")
+
 # Load and scale images
-try:
-    background_image = pygame.image.load(os.path.join(current_dir, "images/background.png")).convert()
-    background_image = pygame.transform.scale(background_image, (screen_width, screen_height))
-    player_image = pygame.image.load(os.path.join(current_dir, "images/player.png"))
-    player_image = pygame.transform.scale(player_image, (cell_width, cell_height))
-    enemy_image = pygame.image.load(os.path.join(current_dir, "images/enemy.png"))
-    enemy_image = pygame.transform.scale(enemy_image, (cell_width, cell_height))
-    bullet_image = pygame.image.load(os.path.join(current_dir, "images/bullet.png"))
-    bullet_image = pygame.transform.scale(bullet_image, (10, 10))
-    power_up_image = pygame.image.load(os.path.join(current_dir, "images/power_up.png"))
-    power_up_image = pygame.transform.scale(power_up_image, (cell_width // 4, cell_height // 4))
-    turret_image = pygame.image.load(os.path.join(current_dir, "images/turret.png"))
-    turret_image = pygame.transform.scale(turret_image, (cell_width, cell_height))
-except pygame.error as e:
-    print(f"Error loading images: {e}")
-    sys.exit(1)
+if headless:
+    # Rendering is a no-op in headless mode, so blank surfaces of the same
+    # sizes stand in for the real images and keep every rect identical
+    background_image = pygame.Surface((screen_width, screen_height))
+    player_image = pygame.Surface((cell_width, cell_height), pygame.SRCALPHA)
+    enemy_image = pygame.Surface((cell_width, cell_height), pygame.SRCALPHA)
+    bullet_image = pygame.Surface((10, 10), pygame.SRCALPHA)
+    power_up_image = pygame.Surface((cell_width // 4, cell_height // 4), pygame.SRCALPHA)
+    turret_image = pygame.Surface((cell_width, cell_height), pygame.SRCALPHA)
+else:
+    # Placeholders of the final sizes; the loader copies the real pixels
+    # into them, so sprites, rotation caches and the shop can hold on to
+    # them from the start
+    background_image = assets.placeholder((screen_width, screen_height), (20, 20, 30), alpha=False)
+    player_image = assets.placeholder(SPRITE_SIZES["player"])
+    enemy_image = assets.placeholder(SPRITE_SIZES["enemy"])
+    bullet_image = assets.placeholder(SPRITE_SIZES["bullet"])
+    power_up_image = assets.placeholder(SPRITE_SIZES["power_up"])
+    turret_image = assets.placeholder(SPRITE_SIZES["turret"])
+sprite_images = {"player": player_image, "enemy": enemy_image, "bullet": bullet_image,
+                 "power_up": power_up_image, "turret": turret_image}
+sounds = {}
+
+def install_sprites(decoded):
+    for name, image in assets.finish_sprites(decoded).items():
+        assets.copy_into(sprite_images[name], image)
+    # Rotations made from the placeholders are not updated by copy_into
+    player_rotations.clear()
+    bullet_rotations.clear()
+    # The shop panel is composed once, with whatever icons it had then
+    shop.build()
+    renderer.invalidate()
+
+def install_background(image):
+    assets.copy_into(background_image, image.convert())
+    renderer.invalidate()
+
+def queue_assets(loader):
+    for names, atlas_name, critical in ((CRITICAL_SPRITES, "critical", True), (EXTRA_SPRITES, "extras", False)):
+        sources = {name: os.path.join(current_dir, f"images/{name}.png") for name in names}
+        sizes = {name: SPRITE_SIZES[name] for name in names}
+        loader.submit(atlas_name, partial(assets.decode_sprites, sources, sizes, asset_cache_dir, atlas_name),
+                      install_sprites, critical)
+    loader.submit("background", partial(assets.decode_background, os.path.join(current_dir, "images/background.png"),
+                                         (screen_width, screen_height), asset_cache_dir), install_background)
+    if pygame.mixer.get_init() and os.path.isdir(sound_dir):
+        for filename in sorted(os.listdir(sound_dir)):
+            name, ext = os.path.splitext(filename)
+            path = os.path.join(sound_dir, filename)
+            if ext in (".wav", ".ogg") and path != music_file:
+                loader.submit(name, partial(pygame.mixer.Sound, path), partial(sounds.__setitem__, name))
+
+def play_sound(name):
+    sound = sounds.get(name)
+    if sound is not None:
+        sound.play()
+
+# Decoding starts on worker threads straight away and overlaps the rest of
+# startup; headless runs keep their blank surfaces and queue nothing
+asset_loader = AssetLoader()
+if not headless:
+    queue_assets(asset_loader)
+
+player_rotations = RotationCache(player_image, ROTATION_STEP, ROTATION_CACHE_SIZE)
+bullet_rotations = RotationCache(bullet_image, ROTATION_STEP, ROTATION_CACHE_SIZE)
 
 class Player(pygame.sprite.Sprite):
     def __init__(self):
@@ -51,8 +203,9 @@ class Player(pygame.sprite.Sprite):
         self.shotgun_level = 0
         self.shield_level = 0
         self.turret_level = 0
-        self.lightning_gun_level = 1  # Assuming starting with level 1 for demonstration
+        self.lightning_gun_level = LIGHTNING_START_LEVEL
         self.angle = 0
+        self.prev_center = self.rect.center
 
     def update(self, keys):
         if keys[pygame.K_w] and self.rect.y > 0:
@@ -67,8 +220,10 @@ class Player(pygame.sprite.Sprite):
     def rotate(self, mouse_pos):
         rel_x, rel_y = mouse_pos[0] - self.rect.centerx, mouse_pos[1] - self.rect.centery
         self.angle = (180 / math.pi) * -math.atan2(rel_y, rel_x)
-        self.image = pygame.transform.rotate(player_image, self.angle)
-        self.rect = self.image.get_rect(center=self.rect.center)
+        self.image, (offset_x, offset_y) = player_rotations.get(self.angle)
+        center_x, center_y = self.rect.center
+        self.rect.size = self.image.get_size()
+        self.rect.topleft = (center_x + offset_x, center_y + offset_y)
 
     def take_damage(self, amount):
         self.health -= amount
@@ -78,8 +233,13 @@ class Player(pygame.sprite.Sprite):
 class Bullet(pygame.sprite.Sprite):
     def __init__(self, x, y, angle, damage):
         super().__init__()
-        self.image = pygame.transform.rotate(bullet_image, -angle)
-        self.rect = self.image.get_rect(center=(x, y))
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.reset(x, y, angle, damage)
+
+    def reset(self, x, y, angle, damage):
+        self.image, (offset_x, offset_y) = bullet_rotations.get(-angle)
+        self.rect.update(x + offset_x, y + offset_y, *self.image.get_size())
+        self.prev_center = self.rect.center
         self.angle = angle
         self.speed = 20
         self.dx = math.cos(math.radians(angle)) * self.speed
@@ -92,42 +252,99 @@ class Bullet(pygame.sprite.Sprite):
         if self.rect.right < 0 or self.rect.left > screen_width or self.rect.bottom < 0 or self.rect.top > screen_height:
             self.kill()
 
+    def kill(self):
+        if self.alive():
+            super().kill()
+            bullet_pool.release(self)
+
+LIGHTNING_RANGE = 200
+LIGHTNING_FRAMES = 6
+LIGHTNING_COLOR = (255, 255, 255)
+
 class LightningChain:
-    def __init__(self, origin_x, origin_y, damage, chain_count, angle):
+    # A finite-lifetime effect: hops are resolved once on the first update,
+    # the resulting path (origin, struck enemy, origin, next enemy, ...) is
+    # drawn for LIGHTNING_FRAMES frames and the chain is then returned to
+    # lightning_pool for reuse.
+    __slots__ = ("path", "origin_x", "origin_y", "damage", "chain_count", "angle",
+                 "chained_enemies", "resolved", "frames_left")
+
+    def __init__(self, origin_x, origin_y, damage, chain_count, angle, chained_enemies=None):
+        self.path = []
+        self.reset(origin_x, origin_y, damage, chain_count, angle, chained_enemies)
+
+    def reset(self, origin_x, origin_y, damage, chain_count, angle, chained_enemies=None):
         self.origin_x = origin_x
         self.origin_y = origin_y
         self.damage = damage
         self.chain_count = chain_count
         self.angle = angle
-        self.chained_enemies = []
+        # Shared by every hop of one chain so an enemy is struck at most once
+        self.chained_enemies = set() if chained_enemies is None else chained_enemies
+        self.path.clear()
+        self.resolved = False
+        self.frames_left = LIGHTNING_FRAMES
 
     def update(self):
-        for enemy in enemies:
-            if enemy not in self.chained_enemies:
-                distance = math.sqrt((enemy.rect.centerx - self.origin_x) ** 2 + (enemy.rect.centery - self.origin_y) ** 2)
-                if distance < 200:
-                    self.chained_enemies.append(enemy)
-                    pygame.draw.line(screen, (255, 255, 255), (self.origin_x, self.origin_y), enemy.rect.center, 2)
-                    enemy.take_damage(self.damage)
-                    if self.chain_count > 1:
-                        new_chain = LightningChain(enemy.rect.centerx, enemy.rect.centery, self.damage, self.chain_count - 1, self.angle)
-                        lightning_chains.append(new_chain)
+        if not self.resolved:
+            self.resolve()
+        self.frames_left -= 1
+
+    def resolve(self):
+        self.resolved = True
+        origin = (self.origin_x, self.origin_y)
+        for enemy in enemy_grid.query_radius(self.origin_x, self.origin_y, LIGHTNING_RANGE):
+            if enemy.alive() and enemy not in self.chained_enemies:
+                self.chained_enemies.add(enemy)
+                self.path += (origin, enemy.rect.center)
+                enemy.take_damage(self.damage)
+                if self.chain_count > 1:
+                    lightning_chains.append(lightning_pool.acquire(enemy.rect.centerx, enemy.rect.centery, self.damage,
+                                                                self.chain_count - 1, self.angle, self.chained_enemies))
+
+def update_lightning_chains():
+    # Chains appended by resolve() are picked up by the same pass
+    for chain in lightning_chains:
+        chain.update()
+    expired = [chain for chain in lightning_chains if chain.frames_left <= 0]
+    if expired:
+        lightning_chains[:] = [chain for chain in lightning_chains if chain.frames_left > 0]
+        for chain in expired:
+            release_chain(chain)
+
+def release_chain(chain):
+    chain.chained_enemies = None
+    chain.path.clear()
+    lightning_pool.release(chain)
 
 
 class Enemy(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
         self.image = enemy_image
-        self.rect = self.image.get_rect(center=(x, y))
+        self.rect = self.image.get_rect()
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        self.rect.size = self.image.get_size()
+        self.rect.center = (x, y)
+        self.prev_center = self.rect.center
         self.speed = 1
-        self.health = 50 + (level - 1) * 10
+        self.health = enemy_max_health()
 
     def update(self):
-        dx, dy = player.rect.centerx - self.rect.centerx, player.rect.centery - self.rect.centery
-        distance = math.hypot(dx, dy)
-        dx, dy = dx / distance, dy / distance
-        self.rect.x += dx * self.speed
-        self.rect.y += dy * self.speed
+        direction = flow_field.direction_at(*self.rect.center)
+        if direction is not None:
+            self.rect.x += direction[0] * self.speed
+            self.rect.y += direction[1] * self.speed
+        else:
+            # Sharing the player's cell: close in directly
+            dx, dy = player.rect.centerx - self.rect.centerx, player.rect.centery - self.rect.centery
+            distance = math.hypot(dx, dy)
+            if distance:
+                dx, dy = dx / distance, dy / distance
+                self.rect.x += dx * self.speed
+                self.rect.y += dy * self.speed
         if self.rect.colliderect(player.rect):
             player.take_damage(1)
             self.kill()
@@ -137,6 +354,11 @@ class Enemy(pygame.sprite.Sprite):
         if self.health <= 0:
             self.kill()
 
+    def kill(self):
+        if self.alive():
+            super().kill()
+            enemy_pool.release(self)
+
 class PowerUp(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
@@ -155,32 +377,24 @@ class Turret(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(center=(x, y))
         self.base_shoot_delay = base_shoot_delay
         self.turret_level = turret_level
-        self.shoot_delay = self.base_shoot_delay / (1.5 ** self.turret_level)
+        self.shoot_delay = self.base_shoot_delay / (TURRET_DELAY_SCALING ** self.turret_level)
         self.last_shot_time = 0
 
     def update(self):
         self.shoot()
-        print(f"Turret shoot delay: {self.shoot_delay} ms")
 
     def shoot(self):
-        current_time = pygame.time.get_ticks()
+        current_time = world.sim_time
         if current_time - self.last_shot_time > self.shoot_delay:
             self.last_shot_time = current_time
             closest_enemy = self.find_closest_enemy()
             if closest_enemy:
                 bullet_damage = 10 + 5 * self.turret_level
-                bullet = Bullet(self.rect.centerx, self.rect.centery, self.calculate_angle(closest_enemy), bullet_damage)
+                bullet = bullet_pool.acquire(self.rect.centerx, self.rect.centery, self.calculate_angle(closest_enemy), bullet_damage)
                 bullets.add(bullet)
 
     def find_closest_enemy(self):
-        closest_enemy = None
-        closest_distance = float('inf')
-        for enemy in enemies:
-            distance = math.hypot(enemy.rect.centerx - self.rect.centerx, enemy.rect.centery - self.rect.centery)
-            if distance < closest_distance:
-                closest_enemy = enemy
-                closest_distance = distance
-        return closest_enemy
+        return enemy_grid.nearest(self.rect.centerx, self.rect.centery, pygame.sprite.Sprite.alive)
 
     def calculate_angle(self, enemy):
         dx = enemy.rect.centerx - self.rect.centerx
@@ -197,15 +411,14 @@ class PauseButton(pygame.sprite.Sprite):
         self.font = pygame.font.Font(None, 28)
         self.text = "Pause/Shop"
         self.clicked = False
-
-    def update(self):
+        # The label never changes, so it is rendered once
         text_surface = self.font.render(self.text, True, (255, 255, 255))
         text_rect = text_surface.get_rect(center=(self.image.get_width() // 2, self.image.get_height() // 2))
-        self.image.fill((80, 80, 80))
         self.image.blit(text_surface, text_rect)
+
+    def update(self):
         if self.clicked:
-            global paused
-            paused = not paused
+            world.paused = not world.paused
             self.clicked = False
 
 class ShopButton(pygame.sprite.Sprite):
@@ -218,266 +431,712 @@ class ShopButton(pygame.sprite.Sprite):
 
     def update(self):
         if self.clicked:
-            shop_menu()
-
-def shop_menu():
-    global score
-    shop_running = True
-    selected_item = 0
-    while shop_running:
-        shop_surface = pygame.Surface((400, 600))
-        shop_surface.fill((240, 240, 240))
-        pygame.draw.rect(shop_surface, (200, 200, 200), shop_surface.get_rect(), 2)
-
-        title_text = font.render("Shop Menu", True, (0, 0, 0))
-        shop_surface.blit(title_text, (shop_surface.get_width() // 2 - title_text.get_width() // 2, 20))
-
-        shop_items = [
-            {"name": "Blue Glowing Shield", "price": 300, "description": "Activates a protective blue glow", "icon": power_up_image, "level": player.shield_level},
-            {"name": "Health Boost", "price": 100, "description": "Increase player health by 50", "icon": power_up_image},
-            {"name": "Shotgun Upgrade", "price": 200, "description": "Increase shotgun damage by 50%", "icon": power_up_image, "level": player.shotgun_level},
-            {"name": "Turret", "price": 500, "description": "Spawns a turret that automatically shoots enemies", "icon": turret_image, "level": player.turret_level},
-            {"name": "Lightning Gun Upgrade", "price": 400, "description": "Increases chain count of lightning bolts", "icon": bullet_image, "level": player.lightning_gun_level}
-        ]
-
-        for i, item in enumerate(shop_items):
-            item_surface = pygame.Surface((380, 100))
-            item_surface.fill((220, 220, 220))
-            pygame.draw.rect(item_surface, (200, 200, 200), item_surface.get_rect(), 1)
-
-            item_text = font.render(f"{item['name']}", True, (0, 0, 0))
-            item_price = font.render(f"Price: {item['price']}", True, (0, 0, 0))
-            item_description = font.render(item['description'], True, (0, 0, 0))
-
-            if "level" in item:
-                level_text = font.render(f"Level: {item['level']}", True, (0, 0, 0))
-                item_surface.blit(level_text, (item_surface.get_width() // 2 - level_text.get_width() // 2, 60))
-
-            buy_button = pygame.Surface((100, 40))
-            buy_button.fill((0, 200, 0))
-            buy_text = font.render("Buy", True, (255, 255, 255))
-            buy_button.blit(buy_text, (buy_button.get_width() // 2 - buy_text.get_width() // 2, buy_button.get_height() // 2 - buy_text.get_height() // 2))
-
-            item_surface.blit(item['icon'], (20, item_surface.get_height() // 2 - item['icon'].get_height() // 2))
-            item_surface.blit(item_text, (item_surface.get_width() // 2 - item_text.get_width() // 2, 10))
-            item_surface.blit(item_price, (item_surface.get_width() // 2 - item_price.get_width() // 2, 40))
-            item_surface.blit(buy_button, (item_surface.get_width() - 120, item_surface.get_height() // 2 - 20))
-
-            if i == selected_item:
-                pygame.draw.rect(item_surface, (255, 255, 0), item_surface.get_rect(), 2)
-
-            shop_surface.blit(item_surface, (10, 120 * i + 60))
-
-        close_button = pygame.Surface((100, 40))
-        close_button.fill((200, 0, 0))
-        close_text = font.render("Close", True, (255, 255, 255))
-        close_button.blit(close_text, (close_button.get_width() // 2 - close_text.get_width() // 2, close_button.get_height() // 2 - close_text.get_height() // 2))
-        shop_surface.blit(close_button, (shop_surface.get_width() // 2 - close_button.get_width() // 2, shop_surface.get_height() - 60))
-
-        screen.blit(shop_surface, (screen_width // 2 - 200, screen_height // 2 - 300))
-        pygame.display.flip()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                shop_running = False
-                global running
-                running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = event.pos
-                for i, item in enumerate(shop_items):
-                    item_rect = pygame.Rect(screen_width // 2 - 190, screen_height // 2 - 240 + 120 * i, 380, 100)
-                    buy_button_rect = pygame.Rect(item_rect.right - 120, item_rect.centery - 20, 100, 40)
-                    if buy_button_rect.collidepoint(mouse_pos):
-                        if score >= item['price']:
-                            score -= item['price']
-                            if item['name'] == "Lightning Gun Upgrade":
-                                player.lightning_gun_level += 1
-                                print(f"Lightning Gun Level: {player.lightning_gun_level}")
-                            elif item['name'] == "Blue Glowing Shield":
-                                player.shield_level += 1
-                                print(f"Shield Level: {player.shield_level}")
-                            elif item['name'] == "Health Boost":
-                                player.health += 50
-                                print(f"Health: {player.health}")
-                            elif item['name'] == "Shotgun Upgrade":
-                                player.shotgun_level += 1
-                                print(f"Shotgun Level: {player.shotgun_level}")
-                                for bullet in bullets:
-                                    bullet.damage += 10
-                            elif item['name'] == "Turret":
-                                if len(turrets) < 1:
-                                    turret_x = random.randint(50, screen_width - 50)
-                                    turret_y = random.randint(50, screen_height - 50)
-                                    base_shoot_delay = 1000
-                                    turret = Turret(turret_x, turret_y, player.turret_level, base_shoot_delay)
-                                    turrets.add(turret)
-                                else:
-                                    for turret in turrets:
-                                        turret.shoot_delay = turret.base_shoot_delay / (1.5 ** player.turret_level)
-                                player.turret_level += 1
-                                print(f"Turret Level: {player.turret_level}")
-                            break
-                
-                close_button_rect = pygame.Rect(screen_width // 2 - 50, screen_height // 2 + 240, 100, 40)
-                if close_button_rect.collidepoint(mouse_pos):
-                    shop_running = False
-
-def draw_health_bar(screen, pos, size, borderC, backC, healthC, progress):
-    pygame.draw.rect(screen, backC, (*pos, *size))
-    pygame.draw.rect(screen, borderC, (*pos, *size), 1)
-    innerPos = (pos[0] + 1, pos[1] + 1)
-    innerSize = ((size[0] - 2) * progress, size[1] - 2)
-    pygame.draw.rect(screen, healthC, (*innerPos, *innerSize))
-
-def draw_player_health_bar():
-    health_rect = pygame.Rect(0, 0, 100, 10)
-    health_rect.topleft = player.rect.bottomleft
-    health_progress = player.health / 100
-    draw_health_bar(screen, health_rect.topleft, health_rect.size, (0, 0, 0), (255, 0, 0), (0, 255, 0), health_progress)
-
-def draw_enemy_health_bar(enemy):
-    health_rect = pygame.Rect(0, 0, 40, 5)
-    health_rect.midbottom = enemy.rect.centerx, enemy.rect.top - 5
-    health_progress = enemy.health / (50 + (level - 1) * 10)
-    health_width = int(health_rect.width * health_progress)
-    health_rect.width = health_width
-    draw_health_bar(screen, health_rect.topleft, health_rect.size, (0, 0, 0), (255, 0, 0), 255, 1)
+            shop.open()
+
+SHOP_ITEMS = (
+    ("Blue Glowing Shield", 300, "Activates a protective blue glow", "shield_level"),
+    ("Health Boost", 100, "Increase player health by 50", None),
+    ("Shotgun Upgrade", 200, "Increase shotgun damage by 50%", "shotgun_level"),
+    ("Turret", 500, "Spawns a turret that automatically shoots enemies", "turret_level"),
+    ("Lightning Gun Upgrade", 400, "Increases chain count of lightning bolts", "lightning_gun_level"),
+)
+
+class ShopMenu:
+    # A state of the main loop rather than a blocking loop of its own. The
+    # panel is composed once; afterwards only level labels and the selection
+    # highlight are redrawn, and only those regions are pushed to the
+    # display. One layout table, in panel coordinates, drives both drawing
+    # and hit-testing.
+    def __init__(self):
+        self.surface = pygame.Surface((400, 600)).convert()
+        self.rect = self.surface.get_rect(topleft=(screen_width // 2 - 200, screen_height // 2 - 300))
+        icons = (power_up_image, power_up_image, power_up_image, turret_image, bullet_image)
+        self.layout = []
+        for i, ((name, price, description, level_attr), icon) in enumerate(zip(SHOP_ITEMS, icons)):
+            panel = pygame.Rect(10, 120 * i + 60, 380, 100)
+            self.layout.append({
+                "name": name,
+                "price": price,
+                "description": description,
+                "level_attr": level_attr,
+                "icon": icon,
+                "panel": panel,
+                "buy": pygame.Rect(panel.right - 120, panel.centery - 20, 100, 40),
+                # Price and level text overlap, so they are redrawn together
+                "labels": pygame.Rect(panel.x + 100, panel.y + 40, 150, 48),
+            })
+        self.close_rect = pygame.Rect(self.rect.width // 2 - 50, self.rect.height - 60, 100, 40)
+        self.active = False
+        self.selected_item = 0
+        self.dirty = []
+        self.build()
+
+    def set_price(self, index, price):
+        self.layout[index]["price"] = price
+        self.build()
+
+    def build(self):
+        surface = self.surface
+        surface.fill((240, 240, 240))
+        pygame.draw.rect(surface, (200, 200, 200), surface.get_rect(), 2)
+        title_text = text_cache.render("Shop Menu", (0, 0, 0))
+        surface.blit(title_text, (surface.get_width() // 2 - title_text.get_width() // 2, 20))
+
+        for item in self.layout:
+            panel = item["panel"]
+            surface.fill((220, 220, 220), panel)
+            pygame.draw.rect(surface, (200, 200, 200), panel, 1)
+            icon = item["icon"]
+            surface.blit(icon, (panel.x + 20, panel.centery - icon.get_height() // 2))
+            item_text = text_cache.render(item["name"], (0, 0, 0))
+            surface.blit(item_text, (panel.centerx - item_text.get_width() // 2, panel.y + 10))
+            self.draw_labels(item)
+            buy = item["buy"]
+            surface.fill((0, 200, 0), buy)
+            buy_text = text_cache.render("Buy", (255, 255, 255))
+            surface.blit(buy_text, buy_text.get_rect(center=buy.center))
+
+        surface.fill((200, 0, 0), self.close_rect)
+        close_text = text_cache.render("Close", (255, 255, 255))
+        surface.blit(close_text, close_text.get_rect(center=self.close_rect.center))
+        # The fresh panel has no level labels or highlight yet
+        self.drawn_levels = [None] * len(self.layout)
+        self.drawn_selection = None
+        self.full_redraw = True
+
+    def draw_labels(self, item, item_level=None):
+        panel = item["panel"]
+        self.surface.fill((220, 220, 220), item["labels"])
+        item_price = text_cache.render(f"Price: {item['price']}", (0, 0, 0))
+        self.surface.blit(item_price, (panel.centerx - item_price.get_width() // 2, panel.y + 40))
+        if item_level is not None:
+            level_text = text_cache.render(f"Level: {item_level}", (0, 0, 0))
+            self.surface.blit(level_text, (panel.centerx - level_text.get_width() // 2, panel.y + 60))
+
+    def refresh(self):
+        surface = self.surface
+        for i, item in enumerate(self.layout):
+            if item["level_attr"] is None:
+                continue
+            item_level = getattr(player, item["level_attr"])
+            if item_level == self.drawn_levels[i]:
+                continue
+            self.drawn_levels[i] = item_level
+            self.draw_labels(item, item_level)
+            self.dirty.append(item["labels"])
+
+        if self.selected_item != self.drawn_selection:
+            if self.drawn_selection is not None:
+                panel = self.layout[self.drawn_selection]["panel"]
+                pygame.draw.rect(surface, (220, 220, 220), panel, 2)
+                pygame.draw.rect(surface, (200, 200, 200), panel, 1)
+                self.dirty.append(panel)
+            panel = self.layout[self.selected_item]["panel"]
+            pygame.draw.rect(surface, (255, 255, 0), panel, 2)
+            self.dirty.append(panel)
+            self.drawn_selection = self.selected_item
+
+    def open(self):
+        self.active = True
+        self.full_redraw = True
+
+    def close(self):
+        self.active = False
+        # The shop drew over the screen behind the renderer's back
+        renderer.invalidate()
+
+    def draw(self):
+        self.refresh()
+        if self.full_redraw:
+            screen.blit(self.surface, self.rect)
+            pygame.display.update(self.rect)
+            self.full_redraw = False
+        elif self.dirty:
+            screen_rects = [rect.move(self.rect.topleft).clip(self.rect) for rect in self.dirty]
+            for local_rect, screen_rect in zip(self.dirty, screen_rects):
+                screen.blit(self.surface, screen_rect, local_rect)
+            pygame.display.update(screen_rects)
+        self.dirty.clear()
+
+    def handle_click(self, pos):
+        local_pos = (pos[0] - self.rect.x, pos[1] - self.rect.y)
+        for i, item in enumerate(self.layout):
+            if item["buy"].collidepoint(local_pos):
+                if world.score >= item["price"]:
+                    buy_item(item)
+                    self.selected_item = i
+                    pending_purchases.append(i)
+                break
+        if self.close_rect.collidepoint(local_pos):
+            self.close()
+
+def buy_item(item):
+    world.score -= item['price']
+    if item['name'] == "Lightning Gun Upgrade":
+        player.lightning_gun_level += 1
+        print(f"Lightning Gun Level: {player.lightning_gun_level}")
+    elif item['name'] == "Blue Glowing Shield":
+        player.shield_level += 1
+        print(f"Shield Level: {player.shield_level}")
+    elif item['name'] == "Health Boost":
+        player.health += 50
+        print(f"Health: {player.health}")
+    elif item['name'] == "Shotgun Upgrade":
+        player.shotgun_level += 1
+        print(f"Shotgun Level: {player.shotgun_level}")
+        for bullet in bullets:
+            bullet.damage += 10
+    elif item['name'] == "Turret":
+        if len(turrets) < 1:
+            turret_x = random.randint(50, screen_width - 50)
+            turret_y = random.randint(50, screen_height - 50)
+            turret = Turret(turret_x, turret_y, player.turret_level, TURRET_BASE_SHOOT_DELAY)
+            turrets.add(turret)
+        else:
+            for turret in turrets:
+                turret.shoot_delay = turret.base_shoot_delay / (TURRET_DELAY_SCALING ** player.turret_level)
+        player.turret_level += 1
+        print(f"Turret Level: {player.turret_level}")
+
+def enemy_max_health():
+    return ENEMY_BASE_HEALTH + (world.level - 1) * ENEMY_HEALTH_PER_LEVEL
+
+# The player's bar fills in proportion to health; an enemy's bar itself
+# shrinks with health, so its strip is filled edge to edge
+player_bar_strips = BarStrips(10, (0, 0, 0), (255, 0, 0), (0, 255, 0))
+enemy_bar_strips = BarStrips(5, (0, 0, 0), (255, 0, 0), (0, 0, 255))
+
+def queue_player_health_bar(player_rect):
+    fill_width = max(0, min(98, int(98 * player.health / 100)))
+    overlay.bar(player_bar_strips, 100, fill_width, player_rect.bottomleft)
+
+def queue_enemy_health_bar(enemy, enemy_rect, max_health):
+    # Undamaged enemies carry no bar
+    if enemy.health >= max_health:
+        return
+    # Anchored where a full bar would start, so damage shrinks it leftward
+    width = int(40 * enemy.health / max_health)
+    x = enemy_rect.centerx - 20
+    y = enemy_rect.top - 10
+    if width <= 0 or x >= screen_width or x + width <= 0 or y >= screen_height or y + 5 <= 0:
+        return
+    overlay.bar(enemy_bar_strips, width, max(0, width - 2), (x, y))
+
+def make_entity_groups():
+    if use_vectorized:
+        return vectorized.EnemyArrayGroup(), vectorized.BulletArrayGroup(bounds=(screen_width, screen_height))
+    return pygame.sprite.Group(), pygame.sprite.Group()
+
+bullet_pool = Pool(Bullet, BULLET_POOL_SIZE)
+enemy_pool = Pool(Enemy, ENEMY_POOL_SIZE)
+lightning_pool = Pool(LightningChain, LIGHTNING_POOL_SIZE)
 
 player = Player()
-enemies = pygame.sprite.Group()
-bullets = pygame.sprite.Group()
+enemies, bullets = make_entity_groups()
 power_ups = pygame.sprite.Group()
 turrets = pygame.sprite.Group()
 lightning_chains = []
-score = 0
-level = 1
+enemy_grid = SpatialHash(cell_width, cell_height)
+flow_field = FlowField(grid_width, grid_height, cell_width, cell_height)
+
+class World:
+    # The game's live scalar state. Entities stay in their groups and pools;
+    # capture_world() and restore_world() copy both to and from snapshots.
+    __slots__ = ("score", "level", "sim_time", "paused", "max_enemies", "spawner")
+
+    def __init__(self, spawner):
+        self.spawner = spawner
+        self.paused = False
+        self.reset()
+
+    def reset(self):
+        self.score = 0
+        self.level = 1
+        self.sim_time = 0
+        # Fixed enemy count that overrides the wave table (benchmarks); None plays waves
+        self.max_enemies = None
+        self.spawner.reset()
+
+world = World(SpawnScheduler(WAVES, grid_width, grid_height, cell_width, cell_height,
+                             ENTITY_BUDGET, SPAWN_TICK_BUDGET_MS))
+
+def reset_game():
+    global player, enemies, bullets
+    player = Player()
+    # Live pooled objects go back to their pools; nothing from the old game
+    # still refers to them, so they are recycled straight away
+    for sprite in list(enemies) + list(bullets):
+        sprite.kill()
+    for chain in lightning_chains:
+        release_chain(chain)
+    lightning_chains.clear()
+    for pool in (bullet_pool, enemy_pool, lightning_pool):
+        pool.recycle()
+    enemies, bullets = make_entity_groups()
+    power_ups.empty()
+    turrets.empty()
+    enemy_grid.clear()
+    world.reset()
+
+def entity_total():
+    return len(enemies) + len(bullets) + len(power_ups) + len(turrets) + len(lightning_chains)
 
 def spawn_enemies():
-    if len(enemies) < 10:
-        x = random.randint(50, screen_width - 50)
-        y = random.randint(50, screen_height - 50)
-        enemies.add(Enemy(x, y))
+    spawner = world.spawner
+    if world.max_enemies is not None:
+        due = 1 if len(enemies) < world.max_enemies else 0
+    else:
+        due = spawner.enemies_due(world.level, len(enemies), entity_total())
+    player_cell = flow_field.cell_of(*player.rect.center)
+    for _ in range(due):
+        x, y = spawner.spawn_point(player_cell, ENEMY_SAFE_CELLS, flow_field.blocked)
+        enemies.add(enemy_pool.acquire(x, y))
 
 def spawn_power_ups():
-    if len(power_ups) < 2:
-        x = random.randint(50, screen_width - 50)
-        y = random.randint(50, screen_height - 50)
+    spawner = world.spawner
+    player_cell = flow_field.cell_of(*player.rect.center)
+    for _ in range(spawner.power_ups_due(world.level, len(power_ups))):
+        x, y = spawner.spawn_point(player_cell, POWER_UP_SAFE_CELLS, flow_field.blocked)
         power_ups.add(PowerUp(x, y))
 
+def fire_weapon():
+    if player.lightning_gun_level > 0:
+        for i in range(3 + player.shotgun_level):
+            bullet_angle = player.angle + (i - 2 - player.shotgun_level // 2) * 10
+            bullet = bullet_pool.acquire(player.rect.centerx, player.rect.centery, bullet_angle, 10 + 5 * player.shotgun_level)
+            bullets.add(bullet)
+            lightning_chain = lightning_pool.acquire(player.rect.centerx, player.rect.centery, 10 + 5 * player.shotgun_level, player.lightning_gun_level, bullet_angle)
+            lightning_chains.append(lightning_chain)
+    else:
+        bullet = bullet_pool.acquire(player.rect.centerx, player.rect.centery, player.angle, 10)
+        bullets.add(bullet)
+
+def capture_positions():
+    # Start-of-tick centers that rendering interpolates from
+    player.prev_center = player.rect.center
+    for sprite in enemies:
+        sprite.prev_center = sprite.rect.center
+    for sprite in bullets:
+        sprite.prev_center = sprite.rect.center
+
+def run_tick(keys, mouse_pos, shots=0, paused=False, purchases=()):
+    # One simulation tick. Live play applies shop purchases as they are
+    # clicked; a replay passes them here, ahead of the tick they preceded.
+    for item_index in purchases:
+        buy_item(shop.layout[item_index])
+    spawn_enemies()
+    spawn_power_ups()
+    if not paused:
+        for _ in range(shots):
+            fire_weapon()
+        update_world(keys, mouse_pos)
+
+def update_world(keys, mouse_pos):
+    world.sim_time += TICK_MS
+    if interpolate:
+        capture_positions()
+
+    with profiler.scope("player"):
+        player.update(keys)
+        player.rotate(mouse_pos)
+
+    with profiler.scope("enemies"):
+        # Recomputed only when the player changes cells or obstacles change
+        flow_field.update(player.rect.center)
+        if use_vectorized:
+            enemies.step(player, flow_field)
+        else:
+            enemies.update()
+
+    with profiler.scope("bullets"):
+        if use_vectorized:
+            bullets.step()
+        else:
+            bullets.update()
+
+    # One broadphase rebuild per tick serves bullet hits, player contact,
+    # turret targeting and lightning hops
+    with profiler.scope("broadphase"):
+        enemy_grid.rebuild(enemies)
+
+    with profiler.scope("collisions"):
+        hits = enemy_grid.query_pairs(bullets)
+        for bullet, enemy_list in hits.items():
+            bullet.kill()
+            for enemy in enemy_list:
+                enemy.take_damage(bullet.damage)
+                world.score += 10
+                if world.score % 500 == 0:
+                    world.level += 1
+
+        collided_enemies = enemy_grid.query_rect(player.rect)
+        for enemy in collided_enemies:
+            if enemy.alive():
+                player.take_damage(1)
+                enemy.kill()
+
+    with profiler.scope("power_ups"):
+        power_ups.update()
+
+    with profiler.scope("turrets"):
+        turrets.update()
+
+    with profiler.scope("lightning"):
+        update_lightning_chains()
+
+    # Sprites killed this tick are no longer referenced and may be reused
+    bullet_pool.recycle()
+    enemy_pool.recycle()
+    lightning_pool.recycle()
+
+def state_digest():
+    # Everything the simulation exposes, in a comparable form
+    return (
+        world.score, world.level, world.sim_time, player.health, tuple(player.rect),
+        (player.shotgun_level, player.shield_level, player.turret_level, player.lightning_gun_level),
+        tuple(sorted((tuple(enemy.rect), enemy.health) for enemy in enemies)),
+        tuple(sorted((tuple(bullet.rect), bullet.damage) for bullet in bullets)),
+        tuple(sorted(tuple(power_up.rect) for power_up in power_ups)),
+        tuple(sorted((tuple(turret.rect), turret.last_shot_time) for turret in turrets)),
+        len(lightning_chains),
+    )
+
+def capture_world():
+    return savestate.WorldState(
+        world.score, world.level, world.sim_time, world.paused, world.max_enemies,
+        world.spawner.credit, world.spawner.scale, random.getstate(),
+        (*player.rect, player.angle, player.health,
+         player.shotgun_level, player.shield_level, player.turret_level, player.lightning_gun_level),
+        [(*enemy.rect.topleft, enemy.health, enemy.speed) for enemy in enemies],
+        [(*bullet.rect.topleft, bullet.angle, bullet.damage) for bullet in bullets],
+        [power_up.rect.topleft for power_up in power_ups],
+        [(*turret.rect.topleft, turret.turret_level, turret.base_shoot_delay, turret.shoot_delay, turret.last_shot_time)
+         for turret in turrets],
+        [(chain.origin_x, chain.origin_y, chain.damage, chain.chain_count, chain.angle,
+          chain.frames_left, chain.resolved, chain.path) for chain in lightning_chains],
+    )
+
+def restore_world(state):
+    reset_game()
+    world.score, world.level, world.sim_time = state.score, state.level, state.sim_time
+    world.paused, world.max_enemies = state.paused, state.max_enemies
+    world.spawner.credit, world.spawner.scale = state.spawn_credit, state.spawn_scale
+    random.setstate(state.rng)
+
+    x, y, width, height, player.angle, player.health, *levels = state.player
+    player.shotgun_level, player.shield_level, player.turret_level, player.lightning_gun_level = levels
+    player.image = player_rotations.get(player.angle)[0]
+    player.rect.update(x, y, width, height)
+    player.prev_center = player.rect.center
+
+    # Entities come from their pools and are fully set up before being
+    # added, since the array-backed groups copy their state on add
+    for x, y, health, speed in state.enemies:
+        enemy = enemy_pool.acquire(0, 0)
+        enemy.rect.topleft = (x, y)
+        enemy.prev_center = enemy.rect.center
+        enemy.health = health
+        enemy.speed = speed
+        enemies.add(enemy)
+    for x, y, angle, damage in state.bullets:
+        bullet = bullet_pool.acquire(0, 0, angle, damage)
+        bullet.rect.topleft = (x, y)
+        bullet.prev_center = bullet.rect.center
+        bullets.add(bullet)
+    for x, y in state.power_ups:
+        power_up = PowerUp(0, 0)
+        power_up.rect.topleft = (x, y)
+        power_ups.add(power_up)
+    for x, y, turret_level, base_shoot_delay, shoot_delay, last_shot_time in state.turrets:
+        turret = Turret(0, 0, turret_level, base_shoot_delay)
+        turret.rect.topleft = (x, y)
+        turret.shoot_delay = shoot_delay
+        turret.last_shot_time = last_shot_time
+        turrets.add(turret)
+    for origin_x, origin_y, damage, chain_count, angle, frames_left, resolved, path in state.chains:
+        chain = lightning_pool.acquire(origin_x, origin_y, damage, chain_count, angle)
+        chain.frames_left = frames_left
+        chain.resolved = resolved
+        chain.path += path
+        lightning_chains.append(chain)
+
+    enemy_grid.rebuild(enemies)
+    renderer.invalidate()
+
+def snapshot():
+    return savestate.encode(capture_world())
+
+def restore(data):
+    restore_world(savestate.decode(data))
+
+def save_game(path):
+    savestate.write(path, snapshot())
+
+def load_game(path):
+    restore(savestate.read(path))
+
+def entity_counts():
+    return {
+        "enemies": len(enemies),
+        "bullets": len(bullets),
+        "power_ups": len(power_ups),
+        "turrets": len(turrets),
+        "lightning_chains": len(lightning_chains),
+    }
+
+def interpolated_rect(sprite, alpha):
+    rect = sprite.rect
+    if alpha >= 1:
+        return rect
+    prev_x, prev_y = sprite.prev_center
+    center_x, center_y = rect.center
+    return rect.move(round((prev_x - center_x) * (1 - alpha)), round((prev_y - center_y) * (1 - alpha)))
+
+def draw_world(alpha=1):
+    player_rect = interpolated_rect(player, alpha)
+    renderer.blit(player.image, player_rect)
+    queue_player_health_bar(player_rect)
+
+    max_health = enemy_max_health()
+    for enemy in enemies:
+        enemy_rect = interpolated_rect(enemy, alpha)
+        renderer.blit(enemy.image, enemy_rect)
+        queue_enemy_health_bar(enemy, enemy_rect, max_health)
+
+    for bullet in bullets:
+        renderer.blit(bullet.image, interpolated_rect(bullet, alpha))
+
+    for power_up in power_ups:
+        renderer.blit(power_up.image, power_up.rect)
+
+    if player.shield_level > 0:
+        overlay.ring((0, 0, 255), player_rect.center, 60 * player.shield_level, 5)
+
+    for turret in turrets:
+        renderer.blit(turret.image, turret.rect)
+
+    for chain in lightning_chains:
+        if chain.path:
+            overlay.path(LIGHTNING_COLOR, chain.path, 2)
+
+    with profiler.scope("overlay"):
+        overlay.flush(renderer)
+
+    with profiler.scope("hud"):
+        hud.update(world.score, player.health, world.level, player.shotgun_level, player.turret_level)
+        hud.draw(renderer)
+
+def render_frame(alpha=1):
+    renderer.begin_frame()
+    if not world.paused:
+        draw_world(alpha)
+    renderer.blit(pause_button.image, pause_button.rect)
+    if world.paused:
+        renderer.blit(text_cache.render("Paused", (255, 255, 255)), (screen_width / 2 - 50, screen_height / 2))
+        renderer.blit(shop_button.image, shop_button.rect)
+    if show_profiler:
+        profiler_overlay.draw(renderer)
+    renderer.end_frame()
+
 running = True
-paused = False
+# Input gathered between ticks and applied at the start of the next one
+pending_shots = 0
+pending_purchases = []
 shop_button = ShopButton()
 pause_button = PauseButton()
-background = pygame.transform.scale(background_image, (screen_width, screen_height))
-
-while running:
-    spawn_enemies()
-    spawn_power_ups()
+shop = ShopMenu()
+scheduler = FrameScheduler(TICK_MS, FPS_CAP, MAX_TICKS_PER_FRAME)
+# Only the windowed loop renders between ticks; headless runs leave it off
+interpolate = False
+
+# F5 keeps an in-memory snapshot and F9 rolls back to it, except while
+# recording, where a rollback would desync the input log
+quick_save = None
+allow_rollback = True
+
+# F3 toggles the profiler overlay, F4 starts and stops a Chrome trace
+profiler = Profiler()
+profiler.enabled = os.environ.get("GAME_PROFILE") == "1"
+profiler_overlay = ProfilerOverlay(profiler, TextCache(pygame.font.Font(None, 22)), scheduler=scheduler)
+show_profiler = profiler.enabled
+hud = Hud(text_cache)
+background = background_image
+renderer = DirtyRenderer(screen, background, DIRTY_RECTS, FULL_REDRAW_THRESHOLD)
+overlay = Overlay()
+
+def show_loading_screen():
+    global running
+    clock = pygame.time.Clock()
+    bar = pygame.Rect(0, 0, 400, 20)
+    bar.center = (screen_width // 2, screen_height // 2)
+    while running and not asset_loader.critical_ready:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        asset_loader.poll()
+        screen.fill((0, 0, 0))
+        label = text_cache.render("Loading...", (255, 255, 255))
+        screen.blit(label, (bar.centerx - label.get_width() // 2, bar.top - 40))
+        pygame.draw.rect(screen, (255, 255, 255), bar, 1)
+        screen.fill((255, 255, 255), (bar.x + 2, bar.y + 2, int((bar.width - 4) * asset_loader.progress), bar.height - 4))
+        pygame.display.flip()
+        clock.tick(FPS)
+    renderer.invalidate()
+    scheduler.reset()
+    if pygame.mixer.get_init() and os.path.exists(music_file):
+        pygame.mixer.music.load(music_file)
+        pygame.mixer.music.play(-1)
+
+def toggle_trace():
+    if profiler.tracing:
+        path = os.path.join(os.getcwd(), f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        count = profiler.export_trace(path)
+        profiler.enabled = show_profiler
+        print(f"Wrote {count} trace events to {path}")
+    else:
+        profiler.start_trace()
+
+def handle_events():
+    global running, show_profiler, pending_shots, quick_save
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif shop.active:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                shop.handle_click(event.pos)
         elif event.type == pygame.MOUSEBUTTONDOWN:
-            if not paused:
-                if player.lightning_gun_level > 0:
-                    for i in range(3 + player.shotgun_level):
-                        bullet_angle = player.angle + (i - 2 - player.shotgun_level // 2) * 10
-                        bullet = Bullet(player.rect.centerx, player.rect.centery, bullet_angle, 10 + 5 * player.shotgun_level)
-                        bullets.add(bullet)
-                        lightning_chain = LightningChain(player.rect.centerx, player.rect.centery, 10 + 5 * player.shotgun_level, player.lightning_gun_level, bullet_angle)
-                        lightning_chains.append(lightning_chain)
-                else:
-                    bullet = Bullet(player.rect.centerx, player.rect.centery, player.angle, 10)
-                    bullets.add(bullet)
+            if not world.paused:
+                pending_shots += 1
             if pause_button.rect.collidepoint(event.pos):
                 pause_button.clicked = True
             if shop_button.rect.collidepoint(event.pos):
                 shop_button.clicked = True
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
-                paused = not paused
-                if paused:
-                    shop_menu()
+                world.paused = not world.paused
+                if world.paused:
+                    shop.open()
+            elif event.key == pygame.K_F3:
+                show_profiler = not show_profiler
+                profiler.enabled = show_profiler or profiler.tracing
+                renderer.invalidate()
+            elif event.key == pygame.K_F4:
+                toggle_trace()
+            elif event.key == pygame.K_F5 and allow_rollback:
+                quick_save = snapshot()
+            elif event.key == pygame.K_F9 and allow_rollback and quick_save is not None:
+                restore(quick_save)
+
+def main(record_path=None, replay_path=None, seed=None, state_path=None):
+    global running, interpolate, pending_shots, allow_rollback
+    interpolate = True
+    replay = None
+    if replay_path:
+        log = InputLog(replay_path)
+        seed, replay = log.seed, iter(log)
+    elif seed is None:
+        seed = random.randrange(2 ** 63)
+    random.seed(seed)
+    recorder = Recorder(record_path, seed, TICK_MS) if record_path else None
+    allow_rollback = recorder is None
+    # Adapting waves to measured tick time would make recordings unreplayable
+    world.spawner.adaptive = recorder is None and replay is None
+    show_loading_screen()
+    # Restored after the critical sprites are in, so the restored player and
+    # bullets take their rotations from the real images. Also done when the
+    # window closed during loading, so the exit save keeps the saved game.
+    if state_path and os.path.exists(state_path):
+        try:
+            load_game(state_path)
+            print(f"Resumed from {state_path}")
+        except (ValueError, OSError) as e:
+            # Set aside rather than deleted, and never retried, so a bad save
+            # cannot crash every restart
+            bad_path = state_path + ".bad"
+            os.replace(state_path, bad_path)
+            print(f"Could not resume from {state_path}: {e}; moved it to {bad_path} and started a new game")
+            reset_game()
+
+    while running:
+        # The shop keeps the game's frame rate even when rendering is uncapped
+        ticks = scheduler.begin_frame(FPS if shop.active else None)
+        profiler.begin_frame()
+        with profiler.scope("input"):
+            if replay is None:
+                handle_events()
+            elif any(event.type == pygame.QUIT for event in pygame.event.get()):
+                running = False
+        if not asset_loader.finished:
+            with profiler.scope("assets"):
+                asset_loader.poll()
 
-    screen.blit(background, (0, 0))
+        if shop.active:
+            shop.draw()
+            continue
 
-    if not paused:
         keys = pygame.key.get_pressed()
-        player.update(keys)
-        player.rotate(pygame.mouse.get_pos())
-        screen.blit(player.image, player.rect)
-        draw_player_health_bar()
-
-        enemies.update()
-        for enemy in enemies:
-            screen.blit(enemy.image, enemy.rect)
-            draw_enemy_health_bar(enemy)
-
-        bullets.update()
-        for bullet in bullets:
-            screen.blit(bullet.image, bullet.rect)
-
-        hits = pygame.sprite.groupcollide(bullets, enemies, True, False)
-        for enemy_list in hits.values():
-            for enemy in enemy_list:
-                enemy.take_damage(bullet.damage)
-                score += 10
-                if score % 500 == 0:
-                    level += 1
-
-        collided_enemies = pygame.sprite.spritecollide(player, enemies, False)
-        for enemy in collided_enemies:
-            player.take_damage(1)
-            enemy.kill()
-
-        power_ups.update()
-        for power_up in power_ups:
-            screen.blit(power_up.image, power_up.rect)
-
-        if player.shield_level > 0:
-            pygame.draw.circle(screen, (0, 0, 255), (player.rect.centerx, player.rect.centery), 60 * player.shield_level, 5)
-
-        turrets.update()
-        for turret in turrets:
-            screen.blit(turret.image, turret.rect)
-
-        for chain in lightning_chains:
-            chain.update()
-
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        health_text = font.render(f"Health: {player.health}", True, (255, 255, 255))
-        level_text = font.render(f"Level: {level}", True, (255, 255, 255))
-
-        power_up_text = ""
-        if player.shotgun_level > 0:
-            power_up_text += f"Shotgun Level: {player.shotgun_level}\n"
-        if player.turret_level > 0:
-            power_up_text += f"Turret Level: {player.turret_level}\n"
-
-        text_box_surface = pygame.Surface((200, 200))
-        text_box_surface.fill((30, 30, 30))
-        text_box_surface.set_alpha(180)
-
-        text_box_surface.blit(score_text, (10, 10))
-        text_box_surface.blit(health_text, (10, 50))
-        text_box_surface.blit(level_text, (10, 90))
-        text_box_surface.blit(font.render(power_up_text, True, (255, 255, 255)), (10, 130))
-
-        pygame.draw.rect(text_box_surface, (200, 200, 200), text_box_surface.get_rect(), 2)
-        screen.blit(text_box_surface, (10, 10))
-
-    pause_button.update()
-    screen.blit(pause_button.image, pause_button.rect)
-
-    if paused:
-        paused_text = font.render("Paused", True, (255, 255, 255))
-        screen.blit(paused_text, (screen_width / 2 - 50, screen_height / 2))
-        shop_button.update()
-        screen.blit(shop_button.image, shop_button.rect)
-        if shop_button.clicked:
-            shop_button.clicked = False
-
-    pygame.display.flip()
-    pygame.time.Clock().tick(60)
-
-pygame.quit()
-sys.exit()
+        mouse_pos = pygame.mouse.get_pos()
+        for _ in range(ticks):
+            if replay is not None:
+                tick_input = next(replay, None)
+                if tick_input is None:
+                    running = False
+                    break
+                world.paused = tick_input.paused
+                run_tick(tick_input.keys, tick_input.mouse_pos, tick_input.shots, world.paused, tick_input.purchases)
+                continue
+            shots = 0 if world.paused else pending_shots
+            pending_shots = 0
+            if shots:
+                play_sound("shoot")
+            if recorder is not None:
+                recorder.record(keys, mouse_pos, shots, world.paused, pending_purchases)
+            pending_purchases.clear()
+            tick_start = time.perf_counter()
+            run_tick(keys, mouse_pos, shots, world.paused)
+            world.spawner.observe((time.perf_counter() - tick_start) * 1000)
+
+        pause_button.update()
+        if world.paused:
+            shop_button.update()
+            if shop_button.clicked:
+                shop_button.clicked = False
+
+        if not shop.active:
+            with profiler.scope("render"):
+                render_frame(scheduler.alpha)
+        if profiler.enabled:
+            profiler.end_frame(entity_counts())
+
+    if recorder is not None and pending_purchases:
+        # Purchases from a shop still open at exit would only be written with
+        # the next tick; record and run that tick so the replay applies them
+        keys = pygame.key.get_pressed()
+        mouse_pos = pygame.mouse.get_pos()
+        recorder.record(keys, mouse_pos, 0, world.paused, pending_purchases)
+        pending_purchases.clear()
+        run_tick(keys, mouse_pos, 0, world.paused)
+    if state_path:
+        save_game(state_path)
+    if recorder is not None:
+        recorder.close(state_digest())
+        print(f"Recorded {recorder.ticks} ticks to {record_path}")
+    if replay_path:
+        print("Replay matches the recording" if log.matches(state_digest()) else "Replay diverged from the recording")
+    if profiler.tracing:
+        toggle_trace()
+    asset_loader.shutdown()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pygame Game")
+    parser.add_argument("--record", metavar="FILE", help="record every tick's input to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recorded input log")
+    parser.add_argument("--seed", type=int, help="random seed for a new game")
+    parser.add_argument("--state", metavar="FILE", help="resume from FILE if it exists and save to it on exit")
+    args = parser.parse_args()
+    if args.state and (args.record or args.replay):
+        parser.error("--state cannot be combined with --record or --replay")
+    main(args.record, args.replay, args.seed, args.state)
@@ -0,0 +1,229 @@
+# Headless, fixed-timestep driver for the game simulation.
+# Importing this module switches game.py to the SDL dummy video driver and
+# no-op rendering, so it must be imported before game.
+import os
+os.environ["GAME_HEADLESS"] = "1"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import math
+import random
+import shutil
+import tempfile
+import time
+
+import pygame
+
+import assets
+import game
+import vectorized
+from replay import InputLog, PressedKeys, Recorder
+
+MOVE_CYCLE = (pygame.K_w, pygame.K_d, pygame.K_s, pygame.K_a)
+
+def scripted_input(tick, fire_every=20):
+    # Deterministic bot: walks a square, sweeps its aim in a circle and
+    # fires at a fixed cadence. Returns (keys, mouse_pos, shots).
+    keys = PressedKeys((MOVE_CYCLE[(tick // 60) % len(MOVE_CYCLE)],))
+    aim = math.radians(tick * 3)
+    mouse_pos = (game.player.rect.centerx + int(100 * math.cos(aim)),
+                 game.player.rect.centery + int(100 * math.sin(aim)))
+    shots = 1 if fire_every and tick % fire_every == 0 else 0
+    return keys, mouse_pos, shots
+
+def kiting_input(tick, fire_every=20):
+    # Backs away from the nearest enemy while aiming and firing at it, and
+    # heads for the middle of the screen when pinned against an edge
+    player_x, player_y = game.player.rect.center
+    target = game.enemy_grid.nearest(player_x, player_y, pygame.sprite.Sprite.alive)
+    if target is None:
+        return scripted_input(tick, fire_every)
+    target_x, target_y = target.rect.center
+    margin = 2 * game.cell_width
+    if margin < player_x < game.screen_width - margin:
+        horizontal = pygame.K_d if player_x >= target_x else pygame.K_a
+    else:
+        horizontal = pygame.K_d if player_x < game.screen_width // 2 else pygame.K_a
+    if margin < player_y < game.screen_height - margin:
+        vertical = pygame.K_s if player_y >= target_y else pygame.K_w
+    else:
+        vertical = pygame.K_s if player_y < game.screen_height // 2 else pygame.K_w
+    shots = 1 if fire_every and tick % fire_every == 0 else 0
+    return PressedKeys((horizontal, vertical)), (target_x, target_y), shots
+
+POLICIES = {"scripted": scripted_input, "kite": kiting_input}
+
+class Scenario:
+    def __init__(self, name, enemies, ticks=600, seed=1, turrets=0, fire_every=20, shotgun_level=0,
+                 vectorized=False, render=False):
+        self.name = name
+        self.enemies = enemies
+        self.ticks = ticks
+        self.seed = seed
+        self.turrets = turrets
+        self.fire_every = fire_every
+        self.shotgun_level = shotgun_level
+        self.vectorized = vectorized
+        # Drive the real draw path against the dummy display as well
+        self.render = render
+
+def setup(scenario):
+    game.use_vectorized = scenario.vectorized and vectorized.available
+    game.reset_game()
+    game.renderer.invalidate()
+    for pool in pools().values():
+        pool.reset_stats()
+    for cache in rotation_caches().values():
+        cache.reset_stats()
+    random.seed(scenario.seed)
+    game.world.max_enemies = scenario.enemies
+    game.player.shotgun_level = scenario.shotgun_level
+    while len(game.enemies) < scenario.enemies:
+        game.spawn_enemies()
+    for i in range(scenario.turrets):
+        x = game.screen_width * (i + 1) // (scenario.turrets + 1)
+        game.turrets.add(game.Turret(x, game.screen_height // 4, 0, 1000))
+
+def step(keys, mouse_pos, shots):
+    game.run_tick(keys, mouse_pos, shots)
+
+entity_counts = game.entity_counts
+
+def pools():
+    return {"bullets": game.bullet_pool, "enemies": game.enemy_pool, "lightning_chains": game.lightning_pool}
+
+def rotation_caches():
+    return {"player": game.player_rotations, "bullets": game.bullet_rotations}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run(scenario, input_source=scripted_input, profile=False):
+    setup(scenario)
+    profiler = game.profiler
+    profiler.enabled = profile or profiler.tracing
+    profiler.history.clear()
+    tick_times = []
+    dirty_fractions = []
+    peak = entity_counts()
+    start = time.perf_counter()
+    for tick in range(scenario.ticks):
+        keys, mouse_pos, shots = input_source(tick, scenario.fire_every)
+        tick_start = time.perf_counter()
+        profiler.begin_frame()
+        step(keys, mouse_pos, shots)
+        if scenario.render:
+            with profiler.scope("render"):
+                game.render_frame()
+            dirty_fractions.append(game.renderer.last_dirty_fraction)
+        profiler.end_frame()
+        tick_times.append(time.perf_counter() - tick_start)
+        for name, count in entity_counts().items():
+            if count > peak[name]:
+                peak[name] = count
+    elapsed = time.perf_counter() - start
+
+    tick_times.sort()
+    return {
+        "scenario": scenario.name,
+        "ticks": scenario.ticks,
+        "ticks_per_sec": scenario.ticks / elapsed if elapsed else float("inf"),
+        "p50_ms": percentile(tick_times, 0.50) * 1000,
+        "p99_ms": percentile(tick_times, 0.99) * 1000,
+        "peak": peak,
+        "pools": {name: pool.stats() for name, pool in pools().items()},
+        "rotations": {name: cache.stats() for name, cache in rotation_caches().items()},
+        "phases_ms": profiler.averages() if profiler.enabled else None,
+        "dirty_pct": 100 * sum(dirty_fractions) / len(dirty_fractions) if dirty_fractions else None,
+        "score": game.world.score,
+        "level": game.world.level,
+        "health": game.player.health,
+    }
+
+state_digest = game.state_digest
+
+def new_game(seed, use_vectorized=False):
+    # The state game.main() starts from, as recorded in an input log
+    game.use_vectorized = use_vectorized and vectorized.available
+    game.reset_game()
+    game.renderer.invalidate()
+    random.seed(seed)
+
+def record(path, ticks, seed=1, input_source=scripted_input, fire_every=20):
+    new_game(seed)
+    recorder = Recorder(path, seed, game.TICK_MS)
+    for tick in range(ticks):
+        keys, mouse_pos, shots = input_source(tick, fire_every)
+        recorder.record(keys, mouse_pos, shots, False)
+        step(keys, mouse_pos, shots)
+    recorder.close(state_digest())
+    return recorder.ticks
+
+def replay(path, use_vectorized=False):
+    # Re-simulates an input log as fast as possible and checks the final
+    # state against the hash stored when it was recorded
+    log = InputLog(path)
+    if log.tick_ms != game.TICK_MS:
+        raise ValueError(f"{path} was recorded at {log.tick_ms} ms per tick, not {game.TICK_MS}")
+    new_game(log.seed, use_vectorized)
+    start = time.perf_counter()
+    for tick_input in log:
+        game.run_tick(tick_input.keys, tick_input.mouse_pos, tick_input.shots,
+                      tick_input.paused, tick_input.purchases)
+    elapsed = time.perf_counter() - start
+    return {
+        "replay": path,
+        "ticks": log.ticks,
+        "ticks_per_sec": log.ticks / elapsed if elapsed else float("inf"),
+        "matches": log.matches(state_digest()),
+        "score": game.world.score,
+        "level": game.world.level,
+        "health": game.player.health,
+    }
+
+def compare_backends(scenario, input_source=scripted_input):
+    # Runs the per-sprite and vectorized paths side by side and returns the
+    # first tick whose state differs, or None when they match throughout
+    if not vectorized.available:
+        raise RuntimeError("numpy is not installed")
+    digests = []
+    for use_arrays in (False, True):
+        scenario.vectorized = use_arrays
+        setup(scenario)
+        trace = [state_digest()]
+        for tick in range(scenario.ticks):
+            step(*input_source(tick, scenario.fire_every))
+            trace.append(state_digest())
+        digests.append(trace)
+    for tick, (expected, actual) in enumerate(zip(*digests)):
+        if expected != actual:
+            return tick
+    return None
+
+def startup_times():
+    # Cold (empty cache) and warm load times in ms for all the real images,
+    # and the warm time to load just what the first frame needs
+    sources = {name: os.path.join(game.current_dir, f"images/{name}.png") for name in game.SPRITE_SIZES}
+    background = os.path.join(game.current_dir, "images/background.png")
+    cache_dir = tempfile.mkdtemp(prefix="asset_cache_")
+    try:
+        times = {}
+        for phase in ("cold", "warm"):
+            start = time.perf_counter()
+            assets.load_sprites(sources, game.SPRITE_SIZES, cache_dir)
+            if os.path.exists(background):
+                assets.load_background(background, (game.screen_width, game.screen_height), cache_dir)
+            times[phase] = (time.perf_counter() - start) * 1000
+        # The game itself only waits for the critical atlas before its
+        # first frame; everything else loads in the background
+        critical = {name: sources[name] for name in game.CRITICAL_SPRITES}
+        sizes = {name: game.SPRITE_SIZES[name] for name in game.CRITICAL_SPRITES}
+        assets.load_sprites(critical, sizes, cache_dir, "critical")
+        start = time.perf_counter()
+        assets.load_sprites(critical, sizes, cache_dir, "critical")
+        times["first_frame"] = (time.perf_counter() - start) * 1000
+        return times
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
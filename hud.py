@@ -0,0 +1,63 @@
+# Cached text rendering and a dirty-tracked HUD panel.
+import pygame
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (string, colour). Values like the score
+    # churn through new strings, so the cache is dropped once it grows past
+    # max_entries rather than tracking recency per entry.
+    def __init__(self, font, max_entries=256):
+        self.font = font
+        self.max_entries = max_entries
+        self.surfaces = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= self.max_entries:
+                self.surfaces.clear()
+            surface = self.font.render(text, True, color)
+            self.surfaces[key] = surface
+        return surface
+
+
+class Hud:
+    def __init__(self, text_cache, pos=(10, 10), size=(200, 200)):
+        self.text = text_cache
+        self.pos = pos
+        self.panel = pygame.Surface(size).convert()
+        self.panel.set_alpha(180)
+        self.rect = self.panel.get_rect(topleft=pos)
+        self.state = None
+
+    def update(self, score, health, level, shotgun_level, turret_level):
+        # Recomposes the panel only when a displayed value changed and
+        # reports whether it did
+        state = (score, health, level, shotgun_level, turret_level)
+        if state == self.state:
+            return False
+        self.state = state
+
+        white = (255, 255, 255)
+        panel = self.panel
+        panel.fill((30, 30, 30))
+        panel.blit(self.text.render(f"Score: {score}", white), (10, 10))
+        panel.blit(self.text.render(f"Health: {health}", white), (10, 50))
+        panel.blit(self.text.render(f"Level: {level}", white), (10, 90))
+
+        power_up_lines = []
+        if shotgun_level > 0:
+            power_up_lines.append(f"Shotgun Level: {shotgun_level}")
+        if turret_level > 0:
+            power_up_lines.append(f"Turret Level: {turret_level}")
+        y = 130
+        for line in power_up_lines:
+            panel.blit(self.text.render(line, white), (10, y))
+            y += self.text.font.get_linesize()
+
+        pygame.draw.rect(panel, (200, 200, 200), panel.get_rect(), 2)
+        return True
+
+    def draw(self, renderer):
+        renderer.blit(self.panel, self.pos)
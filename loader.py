@@ -0,0 +1,60 @@
+# Background asset loading.
+#
+# Each job is split in two: decode() runs on a worker thread and does the
+# file I/O, decompression and scaling, and finish() runs on the main thread
+# from poll(), where display-format conversion and handing the result to
+# the game are safe. Critical jobs are submitted first and gate the first
+# playable frame; everything else streams in while the game runs, and a
+# job that fails leaves its placeholder in place.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+
+class AssetLoader:
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="assets")
+        self.pending = []
+        self.total = 0
+        self.loaded = 0
+        self.failed = []
+        self.critical_left = 0
+
+    def submit(self, name, decode, finish, critical=False):
+        self.pending.append((name, self.executor.submit(decode), finish, critical))
+        self.total += 1
+        if critical:
+            self.critical_left += 1
+
+    def poll(self, budget_ms=4):
+        # Finishes completed jobs until budget_ms of main-thread time is used
+        deadline = time.perf_counter() + budget_ms / 1000
+        for job in [job for job in self.pending if job[1].done()]:
+            name, future, finish, critical = job
+            self.pending.remove(job)
+            try:
+                finish(future.result())
+                self.loaded += 1
+            except (pygame.error, OSError) as e:
+                print(f"Error loading {name}: {e}")
+                self.failed.append(name)
+            if critical:
+                self.critical_left -= 1
+            if time.perf_counter() > deadline:
+                break
+
+    @property
+    def progress(self):
+        return (self.loaded + len(self.failed)) / self.total if self.total else 1.0
+
+    @property
+    def critical_ready(self):
+        return self.critical_left == 0
+
+    @property
+    def finished(self):
+        return not self.pending
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
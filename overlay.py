@@ -0,0 +1,55 @@
+# Overlay render pass for health bars and effects.
+#
+# draw_world() queues bars, line paths and rings here while it walks the
+# entities, and flush() draws them together after the sprites: every bar
+# is one blit of a pre-rendered strip, all of them handed to the renderer
+# in a single blits() call, and each lightning chain is one draw.lines().
+import pygame
+
+
+class BarStrips:
+    # Health bars of one style, rendered once per (width, filled width)
+    def __init__(self, height, border, back, fill):
+        self.height = height
+        self.border = border
+        self.back = back
+        self.fill = fill
+        self.strips = {}
+
+    def get(self, width, fill_width):
+        key = (width, fill_width)
+        strip = self.strips.get(key)
+        if strip is None:
+            strip = pygame.Surface((width, self.height)).convert()
+            strip.fill(self.back)
+            pygame.draw.rect(strip, self.border, strip.get_rect(), 1)
+            strip.fill(self.fill, (1, 1, fill_width, self.height - 2))
+            self.strips[key] = strip
+        return strip
+
+
+class Overlay:
+    def __init__(self):
+        self.bars = []
+        self.paths = []
+        self.rings = []
+
+    def bar(self, strips, width, fill_width, pos):
+        self.bars.append((strips.get(width, fill_width), pos))
+
+    def path(self, color, points, width):
+        self.paths.append((color, points, width))
+
+    def ring(self, color, center, radius, width):
+        self.rings.append((color, center, radius, width))
+
+    def flush(self, renderer):
+        screen = renderer.screen
+        renderer.blits(self.bars)
+        for color, center, radius, width in self.rings:
+            renderer.mark(pygame.draw.circle(screen, color, center, radius, width))
+        for color, points, width in self.paths:
+            renderer.mark(pygame.draw.lines(screen, color, False, points, width))
+        self.bars.clear()
+        self.paths.clear()
+        self.rings.clear()
@@ -0,0 +1,44 @@
+# Object pools with reset/reuse semantics.
+#
+# acquire() hands out a free object re-initialised through its reset()
+# method, or builds a new one when the pool is empty. Released objects
+# are parked until recycle() runs at the end of the tick: a sprite killed
+# mid-tick can still be referenced by that tick's hit lists and broadphase,
+# so it must not be handed out again before they are gone.
+
+
+class Pool:
+    def __init__(self, factory, capacity):
+        self.factory = factory
+        self.capacity = capacity
+        self.free = []
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def acquire(self, *args):
+        if self.free:
+            self.hits += 1
+            obj = self.free.pop()
+            obj.reset(*args)
+            return obj
+        self.misses += 1
+        return self.factory(*args)
+
+    def release(self, obj):
+        self.pending.append(obj)
+
+    def recycle(self):
+        room = self.capacity - len(self.free)
+        if room < len(self.pending):
+            self.dropped += len(self.pending) - max(room, 0)
+            del self.pending[max(room, 0):]
+        self.free.extend(self.pending)
+        self.pending.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.dropped = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "dropped": self.dropped, "free": len(self.free)}
@@ -0,0 +1,167 @@
+# Per-subsystem frame profiler, on-screen overlay and Chrome trace export.
+#
+# Phases are wrapped in profiler.scope(name). While the profiler is
+# disabled scope() returns one shared no-op context manager, so the cost
+# of leaving the instrumentation in place is a method call per phase.
+# Traces are written in the Chrome trace event format, which loads in
+# chrome://tracing and Perfetto.
+import gc
+import json
+import os
+import sys
+import time
+from collections import defaultdict, deque
+
+import pygame
+
+
+class NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler.record(self.name, self.start, end)
+        return False
+
+
+class Profiler:
+    def __init__(self, window=120, max_trace_events=500000):
+        self.enabled = False
+        self.tracing = False
+        self.window = window
+        self.max_trace_events = max_trace_events
+        self.frame_totals = defaultdict(int)
+        self.history = defaultdict(lambda: deque(maxlen=window))
+        self.counts = {}
+        self.allocations = deque(maxlen=window)
+        self.collections = deque(maxlen=window)
+        self.trace_events = []
+        self.origin = time.perf_counter_ns()
+        self.frame_start = None
+        self.blocks_at_start = 0
+        self.gc_at_start = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def record(self, name, start, end):
+        self.frame_totals[name] += end - start
+        if self.tracing and len(self.trace_events) < self.max_trace_events:
+            self.trace_events.append({
+                "name": name, "ph": "X", "pid": os.getpid(), "tid": 0,
+                "ts": (start - self.origin) / 1000, "dur": (end - start) / 1000,
+            })
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_totals.clear()
+        self.frame_start = time.perf_counter_ns()
+        self.blocks_at_start = sys.getallocatedblocks()
+        self.gc_at_start = sum(stat["collections"] for stat in gc.get_stats())
+
+    def end_frame(self, counts=None):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.record("frame", self.frame_start, time.perf_counter_ns())
+        for name, total in self.frame_totals.items():
+            self.history[name].append(total)
+        # Net allocated blocks and GC passes over the frame
+        self.allocations.append(sys.getallocatedblocks() - self.blocks_at_start)
+        self.collections.append(sum(stat["collections"] for stat in gc.get_stats()) - self.gc_at_start)
+        if counts is not None:
+            self.counts = counts
+        self.frame_start = None
+
+    def averages(self):
+        # Rolling mean milliseconds per phase over the window
+        return {name: sum(samples) / len(samples) / 1e6 for name, samples in self.history.items() if samples}
+
+    def start_trace(self):
+        self.enabled = True
+        self.tracing = True
+        self.trace_events = []
+
+    def export_trace(self, path):
+        self.tracing = False
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+        count = len(self.trace_events)
+        self.trace_events = []
+        return count
+
+
+class ProfilerOverlay:
+    # Rebuilt a few times a second rather than every frame, so the overlay
+    # does not churn text surfaces itself. With a frame scheduler it also
+    # shows the frame rate against the frame-time budget.
+    def __init__(self, profiler, text_cache, pos=(10, 220), refresh_ms=250, scheduler=None):
+        self.profiler = profiler
+        self.scheduler = scheduler
+        self.text = text_cache
+        self.pos = pos
+        self.refresh_ms = refresh_ms
+        self.surface = None
+        self.last_refresh = -refresh_ms
+
+    def build(self):
+        profiler = self.profiler
+        rows = []
+        scheduler = self.scheduler
+        if scheduler is not None:
+            budget = scheduler.budget_ms
+            rows.append(("fps", f"{scheduler.fps:.1f}"))
+            rows.append(("frame", f"{scheduler.frame_ms:.0f} / {budget:.1f} ms" if budget else
+                         f"{scheduler.frame_ms:.0f} ms uncapped"))
+            rows.append(("late frames", str(scheduler.late_frames)))
+            rows.append(("ticks run", str(scheduler.ticks_run)))
+            rows.append(("dropped ticks", str(scheduler.dropped_ticks)))
+        rows += [(name, f"{ms:.2f} ms") for name, ms in sorted(profiler.averages().items(), key=lambda item: -item[1])]
+        rows += [(f"# {name}", str(count)) for name, count in profiler.counts.items()]
+        if profiler.allocations:
+            rows.append(("alloc/frame", f"{sum(profiler.allocations) / len(profiler.allocations):.0f}"))
+            rows.append(("gc/frame", f"{sum(profiler.collections) / len(profiler.collections):.2f}"))
+        if profiler.tracing:
+            rows.append(("tracing", f"{len(profiler.trace_events)} events"))
+        font = self.text.font
+        line_height = font.get_linesize()
+        label_width = max([font.size(label)[0] for label, _ in rows] + [0])
+        value_width = max([font.size(value)[0] for _, value in rows] + [0])
+        surface = pygame.Surface((label_width + value_width + 24, line_height * len(rows) + 10))
+        surface.fill((0, 0, 0))
+        surface.set_alpha(200)
+        for i, (label, value) in enumerate(rows):
+            y = 5 + i * line_height
+            surface.blit(self.text.render(label, (0, 255, 0)), (6, y))
+            value_surface = self.text.render(value, (0, 255, 0))
+            surface.blit(value_surface, (surface.get_width() - 6 - value_surface.get_width(), y))
+        self.surface = surface
+
+    def draw(self, renderer):
+        now = pygame.time.get_ticks()
+        if self.surface is None or now - self.last_refresh >= self.refresh_ms:
+            self.build()
+            self.last_refresh = now
+        renderer.blit(self.surface, self.pos)
@@ -0,0 +1,72 @@
+# Dirty-rectangle renderer.
+#
+# Every draw goes through blit() or mark() so the renderer knows which
+# screen regions changed. At the start of a frame only the regions drawn
+# in the previous frame are restored from the background, and at the end
+# only those regions plus this frame's are pushed to the display. When the
+# dirty area passes full_redraw_threshold (a fraction of the screen) a
+# plain flip is cheaper than many small updates, so it falls back to one.
+import pygame
+
+
+class DirtyRenderer:
+    def __init__(self, screen, background, dirty=True, full_redraw_threshold=0.5):
+        self.screen = screen
+        self.background = background
+        self.dirty = dirty
+        self.full_redraw_threshold = full_redraw_threshold
+        self.screen_rect = screen.get_rect()
+        self.screen_area = self.screen_rect.width * self.screen_rect.height
+        self.previous = []
+        self.drawn = []
+        self.full_frame = True
+        self.last_dirty_fraction = 1.0
+
+    def invalidate(self):
+        # Something drew outside the renderer; repaint everything next frame
+        self.full_frame = True
+
+    def begin_frame(self):
+        self.drawn = []
+        if not self.dirty or self.full_frame:
+            self.screen.blit(self.background, (0, 0))
+            return
+        screen, background = self.screen, self.background
+        for rect in self.previous:
+            screen.blit(background, rect, rect)
+
+    def blit(self, image, pos):
+        rect = self.screen.blit(image, pos)
+        self.drawn.append(rect)
+        return rect
+
+    def blits(self, sequence):
+        rects = self.screen.blits(sequence)
+        self.drawn.extend(rects)
+        return rects
+
+    def mark(self, rect):
+        self.drawn.append(self.screen_rect.clip(rect))
+
+    def end_frame(self):
+        if not self.dirty or self.full_frame:
+            self.push_full()
+            return
+        # Static elements (HUD, buttons, idle sprites) repeat exactly from
+        # frame to frame and are pushed once; partial overlaps are still
+        # counted twice, so the estimate errs toward a full flip
+        rects = list({tuple(rect): rect for rect in self.previous + self.drawn}.values())
+        area = sum(rect.width * rect.height for rect in rects)
+        fraction = area / self.screen_area
+        if fraction > self.full_redraw_threshold:
+            self.push_full()
+            return
+        pygame.display.update(rects)
+        self.previous = self.drawn
+        self.last_dirty_fraction = fraction
+
+    def push_full(self):
+        pygame.display.flip()
+        self.previous = self.drawn
+        self.full_frame = False
+        self.last_dirty_fraction = 1.0
@@ -0,0 +1,113 @@
+# Compact binary input log for recording and deterministic replay.
+#
+# A log is a fixed header (magic, version, RNG seed, tick length), a
+# zlib-compressed stream of one record per simulation tick, and a footer
+# holding the tick count and a hash of the final game state, so a replay
+# can confirm it reproduced the session bit for bit. Each record is the
+# WASD key mask, the mouse position, the shots fired and a flags byte; a
+# tick that follows shop purchases also lists the purchased item indices.
+import hashlib
+import struct
+import zlib
+
+import pygame
+
+MAGIC = b"PGRP"
+# Bumped whenever the simulation changes so that older logs no longer
+# reproduce their sessions (2: wave spawning, 3: every due power-up spawns)
+VERSION = 3
+HEADER = struct.Struct("<4sHQd")
+RECORD = struct.Struct("<BhhBB")
+FOOTER = struct.Struct("<Q20s")
+
+FLAG_PAUSED = 1
+FLAG_PURCHASES = 2
+
+RECORDED_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d)
+
+
+class PressedKeys(frozenset):
+    # Stands in for pygame.key.get_pressed(): keys[pygame.K_w] -> bool
+    def __getitem__(self, key):
+        return key in self
+
+
+def encode_keys(keys):
+    mask = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+def decode_keys(mask):
+    return PressedKeys(key for bit, key in enumerate(RECORDED_KEYS) if mask & (1 << bit))
+
+
+def clamp16(value):
+    return max(-32768, min(32767, int(value)))
+
+
+def state_hash(state):
+    return hashlib.sha1(repr(state).encode()).digest()
+
+
+class TickInput:
+    __slots__ = ("keys", "mouse_pos", "shots", "paused", "purchases")
+
+    def __init__(self, keys, mouse_pos, shots, paused, purchases):
+        self.keys = keys
+        self.mouse_pos = mouse_pos
+        self.shots = shots
+        self.paused = paused
+        self.purchases = purchases
+
+
+class Recorder:
+    def __init__(self, path, seed, tick_ms):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, tick_ms))
+        self.compressor = zlib.compressobj(9)
+        self.ticks = 0
+
+    def record(self, keys, mouse_pos, shots, paused, purchases=()):
+        flags = (FLAG_PAUSED if paused else 0) | (FLAG_PURCHASES if purchases else 0)
+        data = RECORD.pack(encode_keys(keys), clamp16(mouse_pos[0]), clamp16(mouse_pos[1]), min(shots, 255), flags)
+        if purchases:
+            data += bytes([len(purchases), *purchases])
+        self.file.write(self.compressor.compress(data))
+        self.ticks += 1
+
+    def close(self, final_state):
+        self.file.write(self.compressor.flush())
+        self.file.write(FOOTER.pack(self.ticks, state_hash(final_state)))
+        self.file.close()
+
+
+class InputLog:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.seed, self.tick_ms = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an input log")
+        if version != VERSION:
+            raise ValueError(f"{path} is a version {version} input log; this build replays version {VERSION}")
+        self.ticks, self.final_hash = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        self.body = zlib.decompress(data[HEADER.size:len(data) - FOOTER.size])
+
+    def __iter__(self):
+        body = self.body
+        offset = 0
+        while offset < len(body):
+            key_mask, mouse_x, mouse_y, shots, flags = RECORD.unpack_from(body, offset)
+            offset += RECORD.size
+            purchases = ()
+            if flags & FLAG_PURCHASES:
+                count = body[offset]
+                purchases = tuple(body[offset + 1:offset + 1 + count])
+                offset += 1 + count
+            yield TickInput(decode_keys(key_mask), (mouse_x, mouse_y), shots, bool(flags & FLAG_PAUSED), purchases)
+
+    def matches(self, final_state):
+        return state_hash(final_state) == self.final_hash
@@ -0,0 +1,46 @@
+# Rotation sprite cache keyed by quantised angle.
+from collections import OrderedDict
+
+import pygame
+
+
+class RotationCache:
+    def __init__(self, image, step=2, max_entries=None):
+        self.image = image
+        self.step = step
+        self.buckets = max(1, int(round(360 / step)))
+        # Least recently used rotations are dropped beyond max_entries
+        self.max_entries = max_entries if max_entries is not None else self.buckets
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bucket(self, angle):
+        return int(round(angle / self.step)) % self.buckets
+
+    def get(self, angle):
+        # Returns the shared rotated surface and the offset from the sprite
+        # center to its rect's top-left corner
+        key = self.bucket(angle)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        surface = pygame.transform.rotate(self.image, key * 360 / self.buckets)
+        entry = (surface, (-(surface.get_width() // 2), -(surface.get_height() // 2)))
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        # Drops every rotation, e.g. after the source image's pixels changed
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,148 @@
+# Versioned binary snapshots of the game state.
+#
+# WorldState is a plain copy of everything the simulation carries from one
+# tick to the next: the scalars, the RNG state and one tuple per entity.
+# encode() packs it into fixed-size little-endian records behind a magic
+# and version header, so a snapshot can sit in memory for instant rollback
+# or be written to disk and resumed after a restart.
+import os
+import struct
+
+MAGIC = b"PGSV"
+VERSION = 2
+HEADER = struct.Struct("<4sH")
+# score, level, sim_time, paused, max_enemies (-1 for none), spawn credit, spawn scale
+GLOBALS = struct.Struct("<qqd?qdd")
+# Version 1, from before wave spawning: score, level, sim_time, paused and the
+# fixed enemy count, whose old default of V1_MAX_ENEMIES now means waves
+GLOBALS_V1 = struct.Struct("<qqd?q")
+V1_MAX_ENEMIES = 10
+# Mersenne Twister state: 624 words and the position, plus the cached gauss
+RNG = struct.Struct("<625I?d")
+# x, y, width, height, angle, health, shotgun, shield, turret and lightning levels
+PLAYER = struct.Struct("<iiiidqiiii")
+# enemies, bullets, power-ups, turrets, lightning chains
+COUNTS = struct.Struct("<IIIII")
+# x, y, health, speed
+ENEMY = struct.Struct("<iiqd")
+# x, y, angle, damage
+BULLET = struct.Struct("<iidq")
+# x, y
+POWER_UP = struct.Struct("<ii")
+# x, y, turret level, base shoot delay, shoot delay, last shot time
+TURRET = struct.Struct("<iiqddd")
+# origin x, origin y, damage, chain count, angle, frames left, resolved, path points
+CHAIN = struct.Struct("<iiqqdq?H")
+POINT = struct.Struct("<ii")
+
+
+class WorldState:
+    __slots__ = ("score", "level", "sim_time", "paused", "max_enemies", "spawn_credit", "spawn_scale", "rng",
+                 "player", "enemies", "bullets", "power_ups", "turrets", "chains")
+
+    def __init__(self, score, level, sim_time, paused, max_enemies, spawn_credit, spawn_scale, rng,
+                 player, enemies, bullets, power_ups, turrets, chains):
+        self.score = score
+        self.level = level
+        self.sim_time = sim_time
+        self.paused = paused
+        self.max_enemies = max_enemies
+        self.spawn_credit = spawn_credit
+        self.spawn_scale = spawn_scale
+        self.rng = rng
+        self.player = player
+        self.enemies = enemies
+        self.bullets = bullets
+        self.power_ups = power_ups
+        self.turrets = turrets
+        # (origin_x, origin_y, damage, chain_count, angle, frames_left, resolved, path)
+        self.chains = chains
+
+
+def encode(state):
+    version, words, gauss_next = state.rng
+    parts = [
+        HEADER.pack(MAGIC, VERSION),
+        GLOBALS.pack(state.score, state.level, state.sim_time, state.paused,
+                     -1 if state.max_enemies is None else state.max_enemies,
+                     state.spawn_credit, state.spawn_scale),
+        RNG.pack(*words, gauss_next is not None, gauss_next or 0.0),
+        PLAYER.pack(*state.player),
+        COUNTS.pack(len(state.enemies), len(state.bullets), len(state.power_ups),
+                    len(state.turrets), len(state.chains)),
+    ]
+    parts.extend(ENEMY.pack(*enemy) for enemy in state.enemies)
+    parts.extend(BULLET.pack(*bullet) for bullet in state.bullets)
+    parts.extend(POWER_UP.pack(*power_up) for power_up in state.power_ups)
+    parts.extend(TURRET.pack(*turret) for turret in state.turrets)
+    for *chain, path in state.chains:
+        parts.append(CHAIN.pack(*chain, len(path)))
+        parts.extend(POINT.pack(*point) for point in path)
+    return b"".join(parts)
+
+
+def decode(data):
+    # Truncated or otherwise malformed data is reported as ValueError, like a
+    # wrong version, so callers have one error to handle
+    try:
+        state, end = unpack(data)
+    except struct.error as e:
+        raise ValueError(f"truncated or corrupt game snapshot ({e})") from e
+    if end != len(data):
+        raise ValueError("game snapshot has trailing data")
+    return state
+
+
+def unpack(data):
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError(f"not a version 1 or {VERSION} game snapshot")
+    offset = HEADER.size
+    if version == 1:
+        score, level, sim_time, paused, max_enemies = GLOBALS_V1.unpack_from(data, offset)
+        spawn_credit, spawn_scale = 0.0, 1.0
+        if max_enemies == V1_MAX_ENEMIES:
+            max_enemies = None
+        offset += GLOBALS_V1.size
+    else:
+        score, level, sim_time, paused, max_enemies, spawn_credit, spawn_scale = GLOBALS.unpack_from(data, offset)
+        if max_enemies < 0:
+            max_enemies = None
+        offset += GLOBALS.size
+    *words, has_gauss, gauss_next = RNG.unpack_from(data, offset)
+    rng = (3, tuple(words), gauss_next if has_gauss else None)
+    offset += RNG.size
+    player = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    counts = COUNTS.unpack_from(data, offset)
+    offset += COUNTS.size
+
+    groups = []
+    for record, count in zip((ENEMY, BULLET, POWER_UP, TURRET), counts):
+        end = offset + record.size * count
+        groups.append(list(record.iter_unpack(data[offset:end])))
+        offset = end
+    chains = []
+    for _ in range(counts[4]):
+        *chain, path_length = CHAIN.unpack_from(data, offset)
+        offset += CHAIN.size
+        end = offset + POINT.size * path_length
+        chains.append((*chain, list(POINT.iter_unpack(data[offset:end]))))
+        offset = end
+    state = WorldState(score, level, sim_time, paused, max_enemies, spawn_credit, spawn_scale, rng,
+                       player, *groups, chains)
+    return state, offset
+
+
+def write(path, data):
+    # Written beside the target and renamed over it, so a restart mid-write
+    # leaves the previous save intact
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
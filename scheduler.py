@@ -0,0 +1,65 @@
+# Fixed-timestep frame scheduler.
+#
+# The simulation always advances in tick_ms steps, so gameplay speed does
+# not depend on the render rate. Each frame the wall-clock time since the
+# previous frame is added to an accumulator and drained in whole ticks.
+# When the simulation falls behind, at most max_ticks_per_frame ticks run
+# in one frame (rendering is skipped in between) and any remaining backlog
+# is dropped, slowing the game down rather than spiralling. alpha is how
+# far the render time sits between the last two ticks, for interpolation.
+import pygame
+
+
+class FrameScheduler:
+    def __init__(self, tick_ms, fps_cap=60, max_ticks_per_frame=5):
+        self.tick_ms = tick_ms
+        self.fps_cap = fps_cap
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.clock = pygame.time.Clock()
+        self.accumulator = 0.0
+        self.frame_ms = 0.0
+        # Cap in effect for the current frame
+        self.cap = fps_cap
+        self.ticks_run = 0
+        self.dropped_ticks = 0
+        self.late_frames = 0
+
+    def reset(self):
+        # Restarts frame timing, e.g. after a loading screen
+        self.clock.tick()
+        self.accumulator = 0.0
+
+    def begin_frame(self, fps_cap=None):
+        # Waits out the fps cap (0 or None means uncapped) and returns how
+        # many simulation ticks to run this frame
+        self.cap = self.fps_cap if fps_cap is None else fps_cap
+        self.frame_ms = self.clock.tick(self.cap or 0)
+        if self.over_budget:
+            self.late_frames += 1
+        self.accumulator += self.frame_ms
+        ticks = int(self.accumulator // self.tick_ms)
+        if ticks > self.max_ticks_per_frame:
+            self.dropped_ticks += ticks - self.max_ticks_per_frame
+            ticks = self.max_ticks_per_frame
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_ms
+        self.ticks_run += ticks
+        return ticks
+
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.tick_ms, 1.0)
+
+    @property
+    def fps(self):
+        return self.clock.get_fps()
+
+    @property
+    def budget_ms(self):
+        return 1000 / self.cap if self.cap else None
+
+    @property
+    def over_budget(self):
+        # Clock.tick() rounds to whole milliseconds, so allow one of slack
+        return self.budget_ms is not None and self.frame_ms > self.budget_ms + 1
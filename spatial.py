@@ -0,0 +1,120 @@
+# Uniform-grid spatial hash over sprite centers.
+#
+# Sprites are bucketed by the cell containing their rect center. Rect
+# queries widen their search by the largest half extent seen at rebuild
+# time, so every overlapping sprite is found without inserting a sprite
+# into more than one cell. The hash is rebuilt once per tick and may then
+# hold sprites killed later in the same tick, so callers check alive().
+from collections import defaultdict
+
+
+class SpatialHash:
+    def __init__(self, cell_width, cell_height):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cells = defaultdict(list)
+        self.max_half_width = 0
+        self.max_half_height = 0
+        self.bounds = None
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_width), int(y // self.cell_height)
+
+    def clear(self):
+        self.cells.clear()
+        self.max_half_width = 0
+        self.max_half_height = 0
+        self.bounds = None
+
+    def rebuild(self, sprites):
+        self.cells.clear()
+        cells = self.cells
+        cell_width, cell_height = self.cell_width, self.cell_height
+        max_width = max_height = 0
+        for sprite in sprites:
+            rect = sprite.rect
+            x, y = rect.center
+            cells[(int(x // cell_width), int(y // cell_height))].append(sprite)
+            if rect.width > max_width:
+                max_width = rect.width
+            if rect.height > max_height:
+                max_height = rect.height
+        self.max_half_width = max_width // 2 + 1
+        self.max_half_height = max_height // 2 + 1
+        if cells:
+            xs = [cx for cx, _ in cells]
+            ys = [cy for _, cy in cells]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = None
+
+    def _candidates(self, left, top, right, bottom):
+        min_cx, min_cy = self.cell_of(left, top)
+        max_cx, max_cy = self.cell_of(right, bottom)
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def query_radius(self, x, y, radius):
+        # Sprites whose center lies strictly within radius of (x, y)
+        radius_sq = radius * radius
+        found = []
+        for sprite in self._candidates(x - radius, y - radius, x + radius, y + radius):
+            sx, sy = sprite.rect.center
+            if (sx - x) ** 2 + (sy - y) ** 2 < radius_sq:
+                found.append(sprite)
+        return found
+
+    def query_rect(self, rect):
+        # Sprites whose rect overlaps rect, as Rect.colliderect decides it
+        found = []
+        candidates = self._candidates(rect.left - self.max_half_width, rect.top - self.max_half_height,
+                                      rect.right + self.max_half_width, rect.bottom + self.max_half_height)
+        for sprite in candidates:
+            if rect.colliderect(sprite.rect):
+                found.append(sprite)
+        return found
+
+    def query_pairs(self, sprites):
+        # Like pygame.sprite.groupcollide(sprites, <hashed sprites>, False, False)
+        hits = {}
+        for sprite in sprites:
+            found = self.query_rect(sprite.rect)
+            if found:
+                hits[sprite] = found
+        return hits
+
+    def nearest(self, x, y, predicate=None):
+        # Closest sprite center to (x, y), searching rings of cells outward
+        # until no unvisited cell can hold anything closer.
+        if self.bounds is None:
+            return None
+        cx, cy = self.cell_of(x, y)
+        min_cx, min_cy, max_cx, max_cy = self.bounds
+        max_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy)
+        cell_size = min(self.cell_width, self.cell_height)
+        cells = self.cells
+        best = None
+        best_sq = float("inf")
+        for ring in range(max(max_ring, 0) + 1):
+            for gx in range(cx - ring, cx + ring + 1):
+                edge = gx == cx - ring or gx == cx + ring
+                for gy in range(cy - ring, cy + ring + 1) if edge else (cy - ring, cy + ring):
+                    bucket = cells.get((gx, gy))
+                    if not bucket:
+                        continue
+                    for sprite in bucket:
+                        if predicate is not None and not predicate(sprite):
+                            continue
+                        sx, sy = sprite.rect.center
+                        distance_sq = (sx - x) ** 2 + (sy - y) ** 2
+                        if distance_sq < best_sq:
+                            best = sprite
+                            best_sq = distance_sq
+            # Anything in the next ring is at least ring * cell_size away
+            if best is not None and best_sq <= (ring * cell_size) ** 2:
+                break
+        return best
@@ -0,0 +1,89 @@
+# Wave spawn scheduling.
+#
+# A wave table keyed by level gives the enemy cap, the spawn rate in enemies
+# per tick and the power-up cap. Spawns are metered out by a fractional
+# credit, so a wave builds up over many ticks instead of landing at once,
+# and never push the total entity count past entity_budget. When adaptive,
+# the measured simulation time per tick scales the cap and rate down while
+# it runs over tick_budget_ms and lets them recover once it is back under,
+# trading horde size for frame rate.
+#
+# Spawn points come from per-player-cell lists of free grid cells that keep
+# a margin of safe_radius cells around the player; the lists are built on
+# first use and rebuilt only when the blocked cells change.
+import random
+
+MIN_SCALE = 0.25
+
+
+class SpawnScheduler:
+    def __init__(self, waves, grid_width, grid_height, cell_width, cell_height, entity_budget, tick_budget_ms):
+        self.waves = waves
+        self.levels = sorted(waves)
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.entity_budget = entity_budget
+        self.tick_budget_ms = tick_budget_ms
+        self.adaptive = False
+        self.blocked = frozenset()
+        self.cells = {}
+        self.reset()
+
+    def reset(self):
+        self.credit = 0.0
+        self.scale = 1.0
+        self.tick_ms = 0.0
+
+    def wave(self, level):
+        # Levels past the end of the table repeat its last row
+        key = self.levels[0]
+        for wave_level in self.levels:
+            if wave_level > level:
+                break
+            key = wave_level
+        return self.waves[key]
+
+    def enemies_due(self, level, enemy_count, entity_count):
+        cap, rate, _ = self.wave(level)
+        self.credit = min(self.credit + rate * self.scale, max(1.0, rate))
+        room = min(int(cap * self.scale) - enemy_count, self.entity_budget - entity_count)
+        due = max(0, min(int(self.credit), room))
+        self.credit -= due
+        return due
+
+    def power_ups_due(self, level, power_up_count):
+        return max(0, self.wave(level)[2] - power_up_count)
+
+    def observe(self, tick_ms):
+        # Exponential moving average of the simulation cost per tick
+        if not self.adaptive:
+            return
+        self.tick_ms += (tick_ms - self.tick_ms) * 0.1
+        if self.tick_ms > self.tick_budget_ms:
+            self.scale = max(MIN_SCALE, self.scale * 0.95)
+        elif self.tick_ms < self.tick_budget_ms * 0.75:
+            self.scale = min(1.0, self.scale + 0.01)
+
+    def spawn_cells(self, player_cell, safe_radius, blocked):
+        if blocked != self.blocked:
+            self.blocked = frozenset(blocked)
+            self.cells.clear()
+        key = (player_cell, safe_radius)
+        cells = self.cells.get(key)
+        if cells is None:
+            player_x, player_y = player_cell
+            free = [(cx, cy) for cy in range(self.grid_height) for cx in range(self.grid_width)
+                    if (cx, cy) not in self.blocked]
+            cells = [(cx, cy) for cx, cy in free
+                     if max(abs(cx - player_x), abs(cy - player_y)) > safe_radius] or free
+            self.cells[key] = cells
+        return cells
+
+    def spawn_point(self, player_cell, safe_radius, blocked):
+        # A random point in the middle half of a random allowed cell
+        cx, cy = random.choice(self.spawn_cells(player_cell, safe_radius, blocked))
+        x = cx * self.cell_width + self.cell_width // 4 + random.randrange(self.cell_width // 2)
+        y = cy * self.cell_height + self.cell_height // 4 + random.randrange(self.cell_height // 2)
+        return x, y
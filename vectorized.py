@@ -0,0 +1,187 @@
+# Optional NumPy structure-of-arrays backend for enemies and bullets.
+#
+# EnemyArrayGroup and BulletArrayGroup are drop-in sprite groups that keep
+# rect positions and velocities in contiguous arrays, indexed by a slot
+# that is assigned when a sprite joins the group and swap-removed when it
+# leaves. step() advances every member in a handful of array operations and
+# then writes the new positions back to the sprites' rects, which remain as
+# thin views for rendering, collisions and the spatial hash. Health and
+# damage stay on the sprites since they only change in per-hit code.
+#
+# The integer maths mirrors the per-sprite path exactly: pygame rounds
+# float rect coordinates half away from zero.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import pygame
+
+available = np is not None
+
+
+def round_half_away(values):
+    magnitude = np.abs(values)
+    whole = np.floor(magnitude)
+    return (np.sign(values) * (whole + (magnitude - whole >= 0.5))).astype(np.int64)
+
+
+class ArrayGroup(pygame.sprite.Group):
+    float_fields = ()
+
+    def __init__(self, *sprites, capacity=256):
+        self.count = 0
+        self.members = []
+        self.slots = {}
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.w = np.zeros(capacity, dtype=np.int64)
+        self.h = np.zeros(capacity, dtype=np.int64)
+        for field in self.float_fields:
+            setattr(self, field, np.zeros(capacity, dtype=np.float64))
+        super().__init__(*sprites)
+
+    def _arrays(self):
+        return ("x", "y", "w", "h") + self.float_fields
+
+    def _grow(self):
+        for field in self._arrays():
+            array = getattr(self, field)
+            grown = np.zeros(len(array) * 2, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, field, grown)
+
+    def load(self, slot, sprite):
+        rect = sprite.rect
+        self.x[slot] = rect.x
+        self.y[slot] = rect.y
+        self.w[slot] = rect.width
+        self.h[slot] = rect.height
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        if self.count == len(self.x):
+            self._grow()
+        slot = self.count
+        self.count += 1
+        self.members.append(sprite)
+        self.slots[sprite] = slot
+        self.load(slot, sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        slot = self.slots.pop(sprite)
+        last = self.count - 1
+        moved = self.members.pop()
+        if slot != last:
+            self.members[slot] = moved
+            self.slots[moved] = slot
+            for field in self._arrays():
+                array = getattr(self, field)
+                array[slot] = array[last]
+        self.count = last
+
+    def __len__(self):
+        return self.count
+
+    def write_back(self, old_x, old_y):
+        # Only rects that actually moved are touched
+        n = self.count
+        moved = np.flatnonzero((self.x[:n] != old_x) | (self.y[:n] != old_y))
+        members = self.members
+        for slot, x, y in zip(moved.tolist(), self.x[moved].tolist(), self.y[moved].tolist()):
+            members[slot].rect.topleft = (x, y)
+
+    def kill_slots(self, slots):
+        # Descending order keeps swap-removal from moving a pending slot
+        members = self.members
+        for slot in sorted(slots.tolist(), reverse=True):
+            members[slot].kill()
+
+
+class EnemyArrayGroup(ArrayGroup):
+    float_fields = ("speed",)
+
+    def __init__(self, *sprites, capacity=256):
+        self.field_version = None
+        self.field_dx = self.field_dy = self.field_valid = None
+        super().__init__(*sprites, capacity=capacity)
+
+    def load_field(self, flow_field):
+        # Array copy of the flow field, refreshed when it is recomputed
+        self.field_version = flow_field.version
+        directions = flow_field.directions
+        self.field_valid = np.array([d is not None for d in directions])
+        self.field_dx = np.array([d[0] if d else 0.0 for d in directions])
+        self.field_dy = np.array([d[1] if d else 0.0 for d in directions])
+
+    def load(self, slot, sprite):
+        super().load(slot, sprite)
+        self.speed[slot] = sprite.speed
+
+    def step(self, player, flow_field):
+        # Batched Enemy.update: follow the flow field, close in directly in
+        # the player's cell, then resolve contact
+        n = self.count
+        if not n:
+            return
+        if self.field_version != flow_field.version:
+            self.load_field(flow_field)
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        old_x, old_y = x.copy(), y.copy()
+        speed = self.speed[:n]
+        center_x, center_y = x + w // 2, y + h // 2
+
+        cell_x = np.clip(center_x // flow_field.cell_width, 0, flow_field.grid_width - 1)
+        cell_y = np.clip(center_y // flow_field.cell_height, 0, flow_field.grid_height - 1)
+        cell = cell_y * flow_field.grid_width + cell_x
+        follow = self.field_valid[cell]
+        x[follow] = round_half_away(x[follow] + self.field_dx[cell[follow]] * speed[follow])
+        y[follow] = round_half_away(y[follow] + self.field_dy[cell[follow]] * speed[follow])
+
+        target = player.rect
+        dx = (target.centerx - center_x).astype(np.float64)
+        dy = (target.centery - center_y).astype(np.float64)
+        distance = np.hypot(dx, dy)
+        direct = ~follow & (distance != 0)
+        safe = np.where(direct, distance, 1.0)
+        x[direct] = round_half_away(x[direct] + dx[direct] / safe[direct] * speed[direct])
+        y[direct] = round_half_away(y[direct] + dy[direct] / safe[direct] * speed[direct])
+
+        contact = ((x < target.right) & (target.x < x + w) &
+                   (y < target.bottom) & (target.y < y + h))
+        self.write_back(old_x, old_y)
+        hit = np.flatnonzero(contact)
+        if len(hit):
+            for _ in range(len(hit)):
+                player.take_damage(1)
+            self.kill_slots(hit)
+
+
+class BulletArrayGroup(ArrayGroup):
+    float_fields = ("dx", "dy")
+
+    def __init__(self, *sprites, bounds, capacity=256):
+        self.bounds = bounds
+        super().__init__(*sprites, capacity=capacity)
+
+    def load(self, slot, sprite):
+        super().load(slot, sprite)
+        self.dx[slot] = sprite.dx
+        self.dy[slot] = sprite.dy
+
+    def step(self):
+        # Batched Bullet.update: advance along dx/dy and cull off-screen
+        n = self.count
+        if not n:
+            return
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        old_x, old_y = x.copy(), y.copy()
+        x[:] = round_half_away(x + self.dx[:n])
+        y[:] = round_half_away(y + self.dy[:n])
+        width, height = self.bounds
+        offscreen = (x + w < 0) | (x > width) | (y + h < 0) | (y > height)
+        self.write_back(old_x, old_y)
+        gone = np.flatnonzero(offscreen)
+        if len(gone):
+            self.kill_slots(gone)